@@ -0,0 +1,96 @@
+"""Compares the per-call overhead of the device hot paths with the key-building code they replaced.
+
+Run from the repository root with `python -m bench.devices [calls]`. Each row calls one device
+method the given number of times against a MockRobot and against a stub robot that does nothing,
+which isolates the cost of the device wrapper itself.
+"""
+from devices import DistanceSensor
+from devices import DistanceSensorConf
+from devices import Motor
+from devices import MotorConf
+from devices import Servo
+from devices import ServoConf
+from log import LoggerProvider
+from mockrobot import MockRobot
+import sys
+import time
+
+
+class NullRobot:
+    def get_value(self, device_id, key):
+        return 0
+
+    def set_value(self, device_id, key, value):
+        pass
+
+
+class LegacyMotor(Motor):
+    """Motor's hot paths as they were before keys and signs were precomputed."""
+
+    def set_velocity(self, velocity):
+        self._set("velocity", velocity * (-1 if self._is_inverted else 1))
+        return self
+
+    def get_encoder(self, fresh=False):
+        return (self._get("enc") * (-1 if self._is_inverted else 1)
+            * (-1 if self._is_encoder_inverted else 1))
+
+    def _set(self, key, value):
+        self._robot.set_value(self._controller, f"{key}_{self._motor}", value)
+
+    def _get(self, key, fresh=False):
+        return self._robot.get_value(self._controller, f"{key}_{self._motor}")
+
+
+class LegacyServo(Servo):
+    def set_position(self, position):
+        self._robot.set_value(self._controller, "servo" + self._servo, position)
+
+
+class LegacyDistanceSensor(DistanceSensor):
+    def get_distance(self, fresh=False):
+        return self._robot.get_value(self._device, "distance")
+
+
+def load(cls, robot, conf):
+    device = cls()
+    device.load_conf(robot, conf, LoggerProvider().get_logger(cls.__name__))
+    return device
+
+
+def run(call, calls):
+    call()
+    start = time.perf_counter()
+    for _ in range(calls):
+        call()
+    return (time.perf_counter() - start) / calls
+
+
+def main(calls=200000):
+    motor_conf = MotorConf('kb', 'a', True, True, 1)
+    servo_conf = ServoConf('sc', '0')
+    sensor_conf = DistanceSensorConf('ds', 0)
+    print(f'{"call":<28}{"robot":<12}{"legacy ns":>12}{"current ns":>12}')
+    for robot_name, robot_factory in (
+        ('MockRobot', lambda: MockRobot(
+            {'koalabear': 1, 'servocontroller': 1, 'distancesensor': 1}, LoggerProvider()
+        )),
+        ('NullRobot', NullRobot),
+    ):
+        for name, legacy_cls, cls, conf, method, args in (
+            ('Motor.set_velocity', LegacyMotor, Motor, motor_conf, 'set_velocity', (0.5,)),
+            ('Motor.get_encoder', LegacyMotor, Motor, motor_conf, 'get_encoder', ()),
+            ('Servo.set_position', LegacyServo, Servo, servo_conf, 'set_position', (0.5,)),
+            ('DistanceSensor.get_distance', LegacyDistanceSensor, DistanceSensor, sensor_conf,
+                'get_distance', ()),
+        ):
+            per_call = [
+                run(lambda: getattr(device, method)(*args), calls)
+                for device in (load(legacy_cls, robot_factory(), conf),
+                    load(cls, robot_factory(), conf))
+            ]
+            print(f'{name:<28}{robot_name:<12}{per_call[0] * 1e9:>12.0f}{per_call[1] * 1e9:>12.0f}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
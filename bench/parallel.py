@@ -0,0 +1,85 @@
+"""Compares serial and thread-pool processing of the TWDPeripheralsTeleopOpmode layer graph.
+
+Run from the repository root with `python -m bench.parallel [ticks] [latency_ms]`. Every device read
+and write sleeps for the given latency, as a stand-in for the serial round trip a real Robot call
+makes, so the parallel controller can overlap the I/O of the drive, belt, front belt and button
+pusher branches. The sticks and dpad change every tick, so the drive and belt mappings emit, and
+their layers write to the robot, on every tick.
+"""
+from controller import RobotController
+from log import LoggerProvider
+from mockrobot import MockKeyboard
+from mockrobot import MockRobot
+from opmodes import TWDPeripheralsTeleopOpmode
+import hwconf
+import math
+import sys
+import time
+
+
+class LatencyRobot:
+    """Wraps a Robot to sleep for a fixed time in every get_value and set_value call."""
+
+    def __init__(self, robot, latency):
+        self._robot = robot
+        self._latency = latency
+
+    def get_value(self, device_id, key):
+        time.sleep(self._latency)
+        return self._robot.get_value(device_id, key)
+
+    def set_value(self, device_id, key, value):
+        time.sleep(self._latency)
+        self._robot.set_value(device_id, key, value)
+
+
+class SweepGamepad:
+    """A gamepad whose left stick circles and whose dpad flips between opposite directions every
+    tick."""
+
+    def __init__(self):
+        self.tick = 0
+
+    def get_value(self, key):
+        if key == 'joystick_left_x':
+            return 0.5 * math.cos(self.tick / 10)
+        if key == 'joystick_left_y':
+            return 0.5 * math.sin(self.tick / 10)
+        if key in ('dpad_up', 'dpad_left'):
+            return self.tick % 2 == 0
+        if key in ('dpad_down', 'dpad_right'):
+            return self.tick % 2 == 1
+        return 0.0 if key.startswith('joystick') else False
+
+
+def run(workers, ticks, latency):
+    logger_provider = LoggerProvider()
+    opmode = TWDPeripheralsTeleopOpmode()
+    spec = dict(opmode.get_robot_spec(), servocontroller=1)
+    robot = LatencyRobot(MockRobot(spec, logger_provider), latency)
+    gamepad = SweepGamepad()
+    rc = RobotController().parallel(workers)
+    rc.setup(
+        robot,
+        hwconf.spring_2025,
+        opmode.get_layers(gamepad, MockKeyboard()),
+        logger_provider
+    )
+    rc.update()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        gamepad.tick += 1
+        rc.update()
+    return (time.perf_counter() - start) / ticks
+
+
+def main(ticks=100, latency_ms=1):
+    latency = latency_ms / 1000
+    print(f'{"workers":<10}{"ms/tick":>12}')
+    for workers in (None, 2, 4):
+        per_tick = run(workers, ticks, latency)
+        print(f'{str(workers or "serial"):<10}{per_tick * 1000:>12.2f}')
+
+
+if __name__ == '__main__':
+    main(*(float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:])))
@@ -0,0 +1,121 @@
+"""Compares RobotController's topological scheduler, interpreted and compiled, with the hot-set
+scheduler it replaced.
+
+Run from the repository root with `python -m bench.scheduling`. Every non-root layer in the benchmark
+graphs requests a task on every process call, so every layer is due on every tick and the graph
+never finishes.
+"""
+from controller import LayerGraph
+from controller import RobotController
+from layer import Layer
+from layer import LayerProcessContext
+from log import LoggerProvider
+from task import Task
+import sys
+import time
+
+
+class IdleLayer(Layer):
+    def __init__(self, is_root=False):
+        self.visits = 0
+        self._is_root = is_root
+
+    def get_input_tasks(self):
+        return {Task}
+
+    def get_output_tasks(self):
+        return {Task}
+
+    def process(self, ctx):
+        self.visits += 1
+        if not self._is_root:
+            ctx.request_task()
+
+    def accept_task(self, task):
+        pass
+
+
+class HotSetController(RobotController):
+    """The unordered hot-set update loop RobotController used before it had a schedule."""
+
+    def update(self):
+        if self._layers == None:
+            return True
+        hot = set(self._layers.get_sinks())
+        all_escalated = True
+        while hot:
+            layer = hot.pop()
+            completed_tasks = []
+            subtasks = []
+            escalate = False
+            parents = self._layers.get_parents(layer)
+
+            def do_escalate():
+                nonlocal escalate
+                escalate = True
+
+            ctx = LayerProcessContext(
+                lambda t: subtasks.append(t),
+                lambda t: completed_tasks.append(t),
+                do_escalate
+            )
+            layer.process(ctx)
+            for task in completed_tasks:
+                for parent in self._layers.get_task_parents(layer, type(task)):
+                    parent.subtask_completed(task)
+            for task in subtasks:
+                for child in self._layers.get_task_children(layer, type(task)):
+                    child.accept_task(task)
+            if escalate:
+                hot.update(parents)
+            else:
+                all_escalated = False
+        return all_escalated
+
+
+class CompiledController(RobotController):
+    def __init__(self):
+        super().__init__()
+        self.compiled(True)
+
+
+def chain(depth):
+    layers = [IdleLayer(i == 0) for i in range(depth)]
+    return LayerGraph().add_chain(layers), layers
+
+
+def diamonds(depth, width=2):
+    """Stacks `depth` levels of `width` layers, connecting every layer to every layer below it."""
+    levels = [[IdleLayer(i == 0) for _ in range(width)] for i in range(depth)]
+    lg = LayerGraph()
+    for upper, lower in zip(levels[:-1], levels[1:]):
+        lg.add_connections([(a, b) for a in upper for b in lower])
+    return lg, [l for level in levels for l in level]
+
+
+def run(controller_cls, graph_factory, size, ticks):
+    lg, layers = graph_factory(size)
+    rc = controller_cls()
+    rc.setup(None, None, lg, LoggerProvider())
+    start = time.perf_counter()
+    for _ in range(ticks):
+        rc.update()
+    elapsed = time.perf_counter() - start
+    return elapsed / ticks, sum(l.visits for l in layers) / ticks / len(layers)
+
+
+def main(ticks=200):
+    print(f'{"graph":<16}{"controller":<20}{"us/tick":>12}{"visits/layer":>14}')
+    for name, factory, sizes in (
+        ('chain', chain, (10, 100, 1000)),
+        ('diamonds', diamonds, (10, 50, 200)),
+    ):
+        for size in sizes:
+            for controller_cls in (HotSetController, RobotController, CompiledController):
+                per_tick, visits = run(controller_cls, factory, size, ticks)
+                print(f'{name + "-" + str(size):<16}{controller_cls.__name__:<20}'
+                    f'{per_tick * 1e6:>12.1f}{visits:>14.2f}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,186 @@
+"""Benchmarks RobotController.update on synthetic layer graphs of 10 to 5000 layers.
+
+Run from the repository root with `python -m bench.suite [options]`; `--help` lists the options.
+
+Every run is repeated for the interpreted and the compiled controller. Each run reports ticks per
+second, per-tick latency percentiles, the memory retained by the controller after setup, and the
+peak memory allocated by an update, which tracemalloc measures over a few updates before the timed
+ones so it doesn't slow them down.
+"""
+from bench.scheduling import IdleLayer
+from controller import LayerGraph
+from controller import RobotController
+from log import LoggerProvider
+from random import Random
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+
+# The fewest timed updates in a run. With fewer than 200 samples, p99 is just the slowest one.
+MIN_TICKS = 200
+
+# Metrics compared with a baseline, and whether higher values are better.
+METRICS = {
+    'ticks_per_sec': True,
+    'p50_us': False,
+    'p99_us': False,
+    'peak_tick_bytes': False,
+}
+
+
+def chain(size):
+    layers = [IdleLayer(i == 0) for i in range(size)]
+    return LayerGraph().add_chain(layers)
+
+
+def fanout(size):
+    """Connects one source to size - 1 sinks."""
+    root = IdleLayer(True)
+    return LayerGraph().add_connections([(root, IdleLayer()) for _ in range(size - 1)])
+
+
+def diamonds(size, width=4):
+    """Stacks levels of width layers, connecting every layer to every layer in the level below."""
+    levels = [[IdleLayer(i == 0) for _ in range(width)] for i in range(max(size // width, 2))]
+    lg = LayerGraph()
+    for upper, lower in zip(levels[:-1], levels[1:]):
+        lg.add_connections([(a, b) for a in upper for b in lower])
+    return lg
+
+
+def random_dag(size, degree=3, seed=2025):
+    """Connects each layer after the first to up to degree random earlier layers as parents."""
+    rng = Random(seed)
+    layers = [IdleLayer(True)]
+    lg = LayerGraph()
+    for i in range(1, size):
+        layer = IdleLayer()
+        for parent in {layers[rng.randrange(i)] for _ in range(degree)}:
+            lg.add_connection(parent, layer)
+        layers.append(layer)
+    return lg
+
+
+GRAPHS = {
+    'chain': chain,
+    'fanout': fanout,
+    'diamonds': diamonds,
+    'random_dag': random_dag,
+}
+
+
+def run(graph, size, compiled, ticks):
+    tracemalloc.start()
+    try:
+        rc = RobotController().compiled(compiled)
+        rc.setup(None, None, GRAPHS[graph](size), LoggerProvider())
+        setup_bytes, _ = tracemalloc.get_traced_memory()
+        rc.update()
+        tracemalloc.reset_peak()
+        tick_start_bytes, _ = tracemalloc.get_traced_memory()
+        for _ in range(min(ticks, 20)):
+            rc.update()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    for _ in range(ticks):
+        rc.update()
+    latencies = []
+    clock = time.perf_counter
+    start = clock()
+    for _ in range(ticks):
+        tick_start = clock()
+        rc.update()
+        latencies.append(clock() - tick_start)
+    elapsed = clock() - start
+    latencies.sort()
+
+    return {
+        'graph': graph,
+        'size': size,
+        'mode': 'compiled' if compiled else 'interpreted',
+        'ticks_per_sec': ticks / elapsed,
+        'p50_us': latencies[len(latencies) // 2] * 1e6,
+        'p90_us': latencies[int(len(latencies) * 0.9)] * 1e6,
+        'p99_us': latencies[int(len(latencies) * 0.99)] * 1e6,
+        'max_us': latencies[-1] * 1e6,
+        'setup_bytes': setup_bytes,
+        'peak_tick_bytes': peak - tick_start_bytes,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns a description of every metric in results that is worse than in baseline by more
+    than tolerance."""
+    baseline_runs = {(r['graph'], r['size'], r['mode']): r for r in baseline['runs']}
+    regressions = []
+    for result in results['runs']:
+        key = (result['graph'], result['size'], result['mode'])
+        if key not in baseline_runs:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old = baseline_runs[key][metric]
+            new = result[metric]
+            if higher_is_better:
+                regressed = new < old * (1 - tolerance)
+            else:
+                # Small absolute values, like a few bytes of peak memory, are too noisy to compare
+                # as a ratio alone.
+                regressed = new > old * (1 + tolerance) and new - old > 64
+            if regressed:
+                regressions.append(f'{key[0]}-{key[1]} {key[2]}: {metric} {old:.1f} -> {new:.1f}')
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m bench.suite', allow_abbrev=False)
+    parser.add_argument('--sizes', default='10,100,1000,5000',
+        help='comma-separated layer counts to generate each graph shape at')
+    parser.add_argument('--ticks', type=int, default=500,
+        help='timed updates per run, after as many untimed warm-up updates, on graphs of up to 100'
+        f' layers; larger graphs run proportionally fewer, but never fewer than {MIN_TICKS}')
+    parser.add_argument('--output', help='writes the results as JSON to this path')
+    parser.add_argument('--baseline',
+        help='compares the results with a JSON file written by --output, and exits with status 1'
+        ' if any run regressed')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+        help='fraction a metric may worsen by before it counts as a regression')
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    print(f'{"graph":<18}{"mode":<13}{"ticks/s":>11}{"p50 us":>10}{"p99 us":>10}'
+        f'{"setup KiB":>11}{"peak B":>9}')
+    runs = []
+    for graph in GRAPHS:
+        for size in sizes:
+            for compiled in (False, True):
+                # Huge graphs tick slowly, so scale the tick count down to keep runs short.
+                ticks = max(args.ticks * 100 // max(size, 100), MIN_TICKS)
+                result = run(graph, size, compiled, ticks)
+                runs.append(result)
+                print(f'{graph + "-" + str(size):<18}{result["mode"]:<13}'
+                    f'{result["ticks_per_sec"]:>11.0f}{result["p50_us"]:>10.1f}'
+                    f'{result["p99_us"]:>10.1f}{result["setup_bytes"] / 1024:>11.1f}'
+                    f'{result["peak_tick_bytes"]:>9}')
+    results = {'python': sys.version.split()[0], 'runs': runs}
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print('No regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""Measures what the input generators allocate to emit their tasks every tick.
+
+Run from the repository root with `python -m bench.tasks [ticks]`. Each row processes one input
+generator for the given number of ticks, keeping only the last emitted task alive as a mapping
+layer would, and reports the time per tick, the peak memory a tick allocates and the memory one
+emitted task keeps alive.
+"""
+from layer.input import GamepadInputGenerator
+from layer.input import KeyboardInputGenerator
+from mockrobot import MockGamepad
+from mockrobot import MockKeyboard
+import sys
+import time
+import tracemalloc
+
+
+class LastTaskContext:
+    def __init__(self):
+        self.task = None
+
+    def emit_subtask(self, task):
+        self.task = task
+
+
+def run(layer, ticks):
+    ctx = LastTaskContext()
+    layer.process(ctx)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        layer.process(ctx)
+    elapsed = time.perf_counter() - start
+
+    ctx.task = None
+    tracemalloc.start()
+    try:
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        layer.process(ctx)
+        task_bytes, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed / ticks, peak - start_bytes, task_bytes - start_bytes
+
+
+def main(ticks=100000):
+    print(f'{"layer":<28}{"us/tick":>10}{"bytes/tick":>12}{"task bytes":>12}')
+    for name, factory in (
+        ('GamepadInputGenerator', lambda: GamepadInputGenerator(MockGamepad())),
+        ('GamepadInputGenerator pool', lambda: GamepadInputGenerator(MockGamepad(), pool_size=4)),
+        ('KeyboardInputGenerator', lambda: KeyboardInputGenerator(MockKeyboard())),
+    ):
+        per_tick, tick_bytes, task_bytes = run(factory(), ticks)
+        print(f'{name:<28}{per_tick * 1e6:>10.2f}{tick_bytes:>12}{task_bytes:>12}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -1,13 +1,31 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from layer import Layer
 from layer import LayerSetupInfo
 from layer import LayerProcessContext
+from profiling import LayerProfiler
+from tracing import LayerTracer
+from tracing import TracingRobot
+from math import inf
+from time import monotonic
 
 class LayerGraph:
     def __init__(self):
         self._parents = {}
         self._children = {}
+        # Vertex sets are dicts kept up to date as connections are added, so they iterate in
+        # insertion order and can be handed out as read-only keys views.
+        self._verts = {}
+        self._sources = {}
+        self._sinks = {}
+        # Position of each vertex in a topological order (parents before children), maintained
+        # incrementally to detect cycles.
+        self._order = {}
+        self._frozen = False
 
     def add_connection(self, a, b):
+        if self._frozen:
+            raise RuntimeError('Cannot modify a frozen LayerGraph')
         if not isinstance(a, Layer):
             raise TypeError(f'{a} is not a Layer')
         if not isinstance(b, Layer):
@@ -26,18 +44,23 @@ class LayerGraph:
         if not is_compatible:
             raise TypeError(f'Parent {a} and child {b} share no compatible task interface')
 
-        if a not in self._children:
-            self._children[a] = {b}
-        else:
-            self._children[a].add(b)
-
-        if b not in self._parents:
-            self._parents[b] = {a}
-        else:
-            self._parents[b].add(a)
-
-        if self._check_cyclic(a):
+        if a is b:
             raise ValueError(f'Cycle detected')
+        for v in (a, b):
+            if v not in self._verts:
+                self._verts[v] = None
+                self._sources[v] = None
+                self._sinks[v] = None
+                self._order[v] = len(self._order)
+        if self._creates_cycle(a, b):
+            raise ValueError(f'Cycle detected')
+
+        # Neighbor sets are dicts so iteration follows insertion order, which keeps scheduling
+        # deterministic.
+        self._children.setdefault(a, {})[b] = None
+        self._parents.setdefault(b, {})[a] = None
+        self._sinks.pop(a, None)
+        self._sources.pop(b, None)
         return self
 
     def add_connections(self, connections):
@@ -58,43 +81,408 @@ class LayerGraph:
         return self
 
     def get_verts(self):
-        return {e for l in (self._parents.keys(), *self._parents.values()) for e in l}
+        return self._verts.keys()
 
     def get_children(self, vertex):
-        return self._children.get(vertex, set())
+        return self._children.get(vertex, {}).keys()
 
     def get_parents(self, vertex):
-        return self._parents.get(vertex, set())
+        return self._parents.get(vertex, {}).keys()
 
     def get_sources(self):
-        return {v for v in self.get_verts() if v not in self._parents}
+        return self._sources.keys()
 
     def get_sinks(self):
-        return {v for v in self.get_verts() if v not in self._children}
+        return self._sinks.keys()
+
+    def freeze(self):
+        """Fixes the graph's topology and builds its task routing tables.
+
+        Each edge direction gets a table mapping concrete task types to the neighbors that accept
+        them, so delivering a task is a dict lookup instead of a scan over every neighbor's declared
+        task types. Tables are seeded with the declared task types and extended lazily for
+        subclasses seen at runtime.
+        """
+        if self._frozen:
+            return self
+        self._frozen = True
+        verts = self.get_verts()
+        self._child_inputs = {
+            v: tuple((c, tuple(c.get_input_tasks())) for c in self.get_children(v)) for v in verts
+        }
+        self._parent_outputs = {
+            v: tuple((p, tuple(p.get_output_tasks())) for p in self.get_parents(v)) for v in verts
+        }
+        self._child_routes = {v: {} for v in verts}
+        self._parent_routes = {v: {} for v in verts}
+        for v in verts:
+            for task_type in v.get_output_tasks():
+                self.get_task_children(v, task_type)
+            for task_type in v.get_input_tasks():
+                self.get_task_parents(v, task_type)
+        self._schedule = self._build_schedule()
+        return self
+
+    def is_frozen(self):
+        return self._frozen
+
+    def get_schedule(self):
+        """Returns every vertex in reverse topological order, so each layer comes after all of its
+        children. Sources come last, and other ties are broken by insertion order. The graph must
+        be frozen."""
+        return self._schedule
+
+    def _build_schedule(self):
+        # Kahn's algorithm run from the sinks: a vertex becomes ready once all of its children
+        # have been scheduled. Sources have no parents waiting on them, so they can all be held
+        # back to the end.
+        verts = dict.fromkeys((*self._children, *self._parents))
+        ready_counts = {v: len(self._children.get(v, ())) for v in verts}
+        ready = deque(v for v in verts if not ready_counts[v])
+        schedule = []
+        sources = []
+        while ready:
+            vertex = ready.popleft()
+            (schedule if vertex in self._parents else sources).append(vertex)
+            for parent in self._parents.get(vertex, ()):
+                ready_counts[parent] -= 1
+                if not ready_counts[parent]:
+                    ready.append(parent)
+        return tuple(schedule + sources)
+
+    def compile(self):
+        """Generates straight-line Python code for one RobotController update over this graph and
+        returns a function that binds it to per-layer contexts. Freezes the graph.
 
-    def _check_cyclic(self, start):
-        visited = set()
-        stack = [(start, iter(self._children.get(start, [])))]
+        The returned function takes one context per layer in schedule order, each implementing
+        reset, subtasks, completed and escalate like the controller's own, and returns a
+        function of the current time that runs one update and returns whether every processed
+        layer requested a task. The layers' methods are looked up when binding, so bind after
+        instrumenting them. The generated code processes layers exactly as the interpreted
+        update does without gating, with each layer's task routing written out as issubclass
+        checks against its neighbors' declared task types. Layers that override accept_tasks are
+        handed the tasks sent to them at the end of the update, in schedule order.
+        """
+        self.freeze()
+        schedule = self._schedule
+        index = {v: i for i, v in enumerate(schedule)}
+        lines = ['def bind(ctxs):']
+        if schedule:
+            lines.append(f'    {"".join(f"c{i}, " for i in range(len(schedule)))}= ctxs')
+        for i, v in enumerate(schedule):
+            lines.append(f'    p{i} = L[{i}].process')
+            if self._parents.get(v):
+                if _batches_tasks(v):
+                    lines.append(f'    b{i} = []')
+                    lines.append(f'    a{i} = b{i}.append')
+                    lines.append(f'    A{i} = L[{i}].accept_tasks')
+                else:
+                    lines.append(f'    a{i} = L[{i}].accept_task')
+                lines.append(f'    i{i} = I[{i}]')
+            if self._children.get(v):
+                lines.append(f'    s{i} = L[{i}].subtask_completed')
+                lines.append(f'    o{i} = O[{i}]')
+        lines.append('    def tick(now):')
+        lines.append('        all_escalated = True')
+        for i, v in enumerate(schedule):
+            if self._children.get(v):
+                lines.append(f'        r{i} = False')
+        for i, v in enumerate(schedule):
+            parents = [index[p] for p in self.get_parents(v)]
+            children = [index[c] for c in self.get_children(v)]
+            indent = '        '
+            lines.append(f'{indent}# {type(v).__name__}')
+            if children:
+                lines.append(f'{indent}if r{i}:')
+                indent += '    '
+            lines.append(f'{indent}ctx = c{i}')
+            lines.append(f'{indent}ctx.reset(now)')
+            lines.append(f'{indent}p{i}(ctx)')
+            if parents:
+                lines.append(f'{indent}if ctx.completed:')
+                lines.append(f'{indent}    for task in ctx.completed:')
+                lines.append(f'{indent}        t = type(task)')
+                for j in parents:
+                    lines.append(f'{indent}        if issubclass(t, o{j}):')
+                    lines.append(f'{indent}            s{j}(task)')
+            if children:
+                lines.append(f'{indent}if ctx.subtasks:')
+                lines.append(f'{indent}    for task in ctx.subtasks:')
+                lines.append(f'{indent}        t = type(task)')
+                for j in children:
+                    lines.append(f'{indent}        if issubclass(t, i{j}):')
+                    lines.append(f'{indent}            a{j}(task)')
+            lines.append(f'{indent}if ctx.escalate:')
+            if parents:
+                lines.append(f'{indent}    {" = ".join(f"r{j}" for j in parents)} = True')
+            else:
+                lines.append(f'{indent}    pass')
+            lines.append(f'{indent}else:')
+            lines.append(f'{indent}    all_escalated = False')
+        for i, v in enumerate(schedule):
+            if self._parents.get(v) and _batches_tasks(v):
+                lines.append(f'        if b{i}:')
+                lines.append(f'            A{i}(b{i})')
+                lines.append(f'            b{i}.clear()')
+        lines.append('        return all_escalated')
+        lines.append('    return tick')
+        namespace = {
+            'L': schedule,
+            'I': tuple(tuple(v.get_input_tasks()) for v in schedule),
+            'O': tuple(tuple(v.get_output_tasks()) for v in schedule),
+        }
+        exec('\n'.join(lines), namespace)
+        return namespace['bind']
+
+    def get_task_children(self, vertex, task_type):
+        """Returns the children of vertex that accept tasks of task_type. The graph must be frozen."""
+        routes = self._child_routes[vertex]
+        try:
+            return routes[task_type]
+        except KeyError:
+            children = routes[task_type] = tuple(
+                child for child, in_types in self._child_inputs[vertex]
+                if issubclass(task_type, in_types)
+            )
+            return children
+
+    def get_task_parents(self, vertex, task_type):
+        """Returns the parents of vertex that emit tasks of task_type. The graph must be frozen."""
+        routes = self._parent_routes[vertex]
+        try:
+            return routes[task_type]
+        except KeyError:
+            parents = routes[task_type] = tuple(
+                parent for parent, out_types in self._parent_outputs[vertex]
+                if issubclass(task_type, out_types)
+            )
+            return parents
+
+    def _creates_cycle(self, a, b):
+        """Returns whether connecting parent a to child b would create a cycle, and otherwise
+        updates the topological order to allow the connection.
+
+        Uses the Pearce-Kelly algorithm: only the vertices ordered between b and a can be on a
+        cycle through the new edge or need to move, so the search is bounded to them.
+        """
+        order = self._order
+        lower = order[b]
+        upper = order[a]
+        if upper < lower:
+            return False
+        # Everything reachable from b that is ordered no later than a.
+        forward = []
+        visited = {b}
+        stack = [b]
         while stack:
-            child = next(stack[-1][1], None)
-            if child:
-                if any(e[0] == child for e in stack):
+            v = stack.pop()
+            forward.append(v)
+            for child in self._children.get(v, ()):
+                if child is a:
                     return True
-                if child in visited:
-                    continue
-                visited.add(child)
-                stack.append([child, iter(self._children.get(child, []))])
-            else:
-                del stack[-1]
+                if child not in visited and order[child] < upper:
+                    visited.add(child)
+                    stack.append(child)
+        # Everything a is reachable from that is ordered no earlier than b.
+        backward = []
+        visited = {a}
+        stack = [a]
+        while stack:
+            v = stack.pop()
+            backward.append(v)
+            for parent in self._parents.get(v, ()):
+                if parent not in visited and order[parent] > lower:
+                    visited.add(parent)
+                    stack.append(parent)
+        # Reuse the affected positions, placing a and its ancestors before b and its descendants.
+        forward.sort(key=order.__getitem__)
+        backward.sort(key=order.__getitem__)
+        positions = sorted(order[v] for v in (*backward, *forward))
+        for v, position in zip((*backward, *forward), positions):
+            order[v] = position
         return False
 
 
+def _batches_tasks(layer):
+    """Returns whether layer overrides Layer.accept_tasks, and so must be handed the tasks sent to
+    it in an update in one call."""
+    # Checking the instance's dict would make CPython materialize it, which slows down every
+    # attribute access on the layer.
+    return type(layer).accept_tasks is not Layer.accept_tasks
+
+
+class _ScheduledLayer:
+    """Per-layer scheduling state kept by RobotController."""
+    __slots__ = 'layer', 'index', 'parents', 'is_sink', 'is_source', 'requests', 'gated', \
+        'event_driven', 'dirty', 'wake_time', 'period', 'next_due', 'divisor', 'escalated', 'ctx', \
+        'inbox', 'received', 'batched'
+
+    def __init__(self, layer, index, is_sink, is_source, event_driven):
+        self.layer = layer
+        # Position in the schedule.
+        self.index = index
+        self.parents = ()
+        self.is_sink = is_sink
+        self.is_source = is_source
+        # Number of children that requested a task from this layer during the current update.
+        self.requests = 0
+        self.event_driven = event_driven
+        # Whether the layer has accepted a task or had a subtask completed since it was last
+        # processed. Only tracked for event-driven layers.
+        self.dirty = True
+        self.wake_time = None
+        self.period = layer.get_period()
+        self.next_due = -inf
+        self.divisor = layer.get_tick_divisor()
+        if self.divisor < 1:
+            raise ValueError(f'{layer} has a tick divisor less than 1')
+        # Whether the layer may be skipped even when it is due for processing.
+        self.gated = event_driven or self.period != None or self.divisor > 1
+        # Whether the layer requested a task the last time it was processed. Reused when a gated
+        # layer is skipped.
+        self.escalated = False
+        self.ctx = _NodeContext(self)
+        # The first received entries of inbox are the tasks sent to the layer during the current
+        # pass, delivered when the pass ends.
+        self.inbox = []
+        self.received = 0
+        self.batched = _batches_tasks(layer)
+
+    def receive(self, task):
+        received = self.received
+        # The inbox keeps its length, and stale tasks past the received ones, so that steady
+        # traffic doesn't reallocate it.
+        if received == len(self.inbox):
+            self.inbox.append(task)
+        else:
+            self.inbox[received] = task
+        self.received = received + 1
+
+
+class _NodeContext(LayerProcessContext):
+    """The LayerProcessContext RobotController passes to one layer, reused every time the layer is
+    processed so that processing allocates nothing the layer doesn't."""
+    __slots__ = 'subtasks', 'completed', 'escalate', '_node', '_time'
+
+    def __init__(self, node):
+        self.subtasks = []
+        self.completed = []
+        self.escalate = False
+        self._node = node
+        self._time = None
+
+    def reset(self, time):
+        self.subtasks.clear()
+        self.completed.clear()
+        self.escalate = False
+        self._time = time
+
+    def emit_subtask(self, subtask):
+        self.subtasks.append(subtask)
+
+    def complete_task(self, task):
+        self.completed.append(task)
+
+    def request_task(self):
+        self.escalate = True
+
+    def request_wakeup(self, delay):
+        node = self._node
+        if node.event_driven:
+            wake_time = self._time + delay
+            if node.wake_time == None or wake_time < node.wake_time:
+                node.wake_time = wake_time
+
+
 class RobotController:
     def __init__(self):
         self._layers = None
+        self._event_driven = False
+        self._profiler = None
+        self._trace = None
+        self._tracer = None
+        self._latency_tracer = None
+        self._recorder = None
+        self._write_cache = None
+        self._write_batch = None
+        self._read_cache = None
+        self._workers = None
+        self._compiled = False
+
+    # Options, which must be set before setup.
+    def event_driven(self, enable):
+        """Skips idle event-driven layers."""
+        self._event_driven = enable
+        return self
+
+    def instrument(self, enable):
+        """Times every call into a layer with a LayerProfiler."""
+        self._profiler = LayerProfiler() if enable else None
+        return self
+
+    def trace(self, buffer):
+        """Records layer and robot call spans into a TraceBuffer, or stops if buffer is None."""
+        self._trace = buffer
+        return self
+
+    def trace_latency(self, tracer):
+        """Records input-to-actuator latency per layer path into a LatencyTracer."""
+        self._latency_tracer = tracer
+        return self
+
+    def record(self, recorder):
+        """Writes every emitted and completed task to a TaskRecorder's log."""
+        self._recorder = recorder
+        return self
+
+    def cache_writes(self, cache):
+        """Skips redundant robot writes through a WriteCache."""
+        self._write_cache = cache
+        return self
+
+    def batch_writes(self, batch):
+        """Stages robot writes in a WriteBatch flushed at the end of every update."""
+        self._write_batch = batch
+        return self
+
+    def cache_reads(self, cache):
+        """Serves repeated robot reads within an update from a ReadCache."""
+        self._read_cache = cache
+        return self
+
+    def parallel(self, workers):
+        """Processes independent branches on up to workers threads, or serially if None."""
+        self._workers = workers
+        return self
+
+    def compiled(self, enable):
+        """Runs updates with code generated by LayerGraph.compile where the graph allows it."""
+        self._compiled = enable
+        return self
+
+    def get_profiler(self):
+        """Returns the LayerProfiler holding per-layer statistics, or None if not instrumented."""
+        return self._profiler
 
     def setup(self, robot, hw_conf, layers, logger_provider, debug_mode=False):
         self._logger = logger_provider.get_logger("RobotController")
+        # Layers may add listeners during setup.
+        self._update_listeners = []
+        self._teardown_listeners = []
+        if self._write_cache != None:
+            robot = self._write_cache.wrap_robot(robot)
+        if self._trace != None:
+            robot = TracingRobot(robot, self._trace)
+        if self._write_batch != None:
+            robot = self._write_batch.wrap_robot(robot)
+        if self._latency_tracer != None:
+            robot = self._latency_tracer.wrap_robot(robot)
+            self._update_listeners.append(self._latency_tracer.next_tick)
+        if self._recorder != None:
+            self._update_listeners.append(self._recorder.next_tick)
+        if self._read_cache != None:
+            robot = self._read_cache.wrap_robot(robot)
+            self._update_listeners.append(self._read_cache.invalidate)
         setup_info = LayerSetupInfo(
             robot,
             hw_conf,
@@ -103,10 +491,51 @@ class RobotController:
         )
         for layer in layers.get_verts():
             layer.setup(setup_info)
-        self._layers = layers
+        if self._write_batch != None:
+            self._write_batch.flush()
+        self._layers = layers.freeze()
+        nodes = {
+            layer: _ScheduledLayer(
+                layer,
+                i,
+                not layers.get_children(layer),
+                not layers.get_parents(layer),
+                self._event_driven and layer.is_event_driven()
+            )
+            for i, layer in enumerate(layers.get_schedule())
+        }
+        for node in nodes.values():
+            node.parents = tuple(nodes[parent] for parent in layers.get_parents(node.layer))
+        self._nodes = nodes
+        self._schedule = tuple(nodes.values())
+        # Layers handed their tasks in one accept_tasks call at the end of each pass.
+        self._batched = tuple(node for node in self._schedule if node.batched and node.parents)
+        self._branches = None
+        self._executor = None
+        if self._workers:
+            self._partition()
+        if self._branches and (self._trace != None or self._latency_tracer != None
+                or self._write_batch != None):
+            self._executor.shutdown()
+            raise ValueError('Tracing, latency tracing and write batching are not thread-safe;'
+                ' cannot use them while processing branches in parallel')
+        if self._profiler:
+            self._profiler.instrument(layers.get_schedule())
+        if self._trace != None:
+            self._tracer = LayerTracer(self._trace)
+            self._tracer.instrument(layers.get_schedule())
+        if self._latency_tracer != None:
+            self._latency_tracer.instrument(layers.get_schedule())
+        if self._recorder != None:
+            self._recorder.instrument(layers.get_schedule())
         self._debug_mode = debug_mode
-        self._update_listeners = []
-        self._teardown_listeners = []
+        self._ticks = 0
+        self._tick = None
+        if self._compiled:
+            if self._branches or debug_mode or any(node.gated for node in self._schedule):
+                self._logger.info('Cannot compile this layer graph; interpreting it instead')
+            else:
+                self._tick = layers.compile()(tuple(node.ctx for node in self._schedule))
 
     def update(self):
         #self._logger.trace('Begin update')
@@ -114,52 +543,208 @@ class RobotController:
             listener()
         if self._layers == None:
             return True
+        if self._trace != None:
+            self._trace.begin('controller', 'update')
 
-        hot = self._layers.get_sinks()
-        all_escalated = True
-
-        while hot:
-            layer = hot.pop()
-            #self._logger.trace(f'Now processing {str(layer)}')
-            completed_tasks = []
-            subtasks = []
-            escalate = False
-            parents = self._layers.get_parents(layer)
-
-            def do_escalate():
-                nonlocal escalate
-                escalate = True
-
-            ctx = LayerProcessContext(
-                lambda t: subtasks.append(t),
-                lambda t: completed_tasks.append(t),
-                do_escalate
-            )
-            for _ in range(4 if self._debug_mode else 1):
-                layer.process(ctx)
-
-            for task in completed_tasks:
-                for parent in parents:
-                    if any(isinstance(task, cls) for cls in parent.get_output_tasks()):
-                        parent.subtask_completed(task)
-            for task in subtasks:
-                for child in self._layers.get_children(layer):
-                    if any(isinstance(task, cls) for cls in child.get_input_tasks()):
-                        child.accept_task(task)
-
-            if escalate:
-                hot.update(parents)
-            else:
-                all_escalated = False
+        now = monotonic()
+        if self._tick:
+            all_escalated = self._tick(now)
+        elif self._branches:
+            all_escalated = self._update_branches(now)
+        else:
+            all_escalated = self._update_nodes(self._schedule, now, None, self._batched)
 
+        if self._write_batch != None:
+            self._write_batch.flush()
+        self._ticks += 1
+        if self._trace != None:
+            self._trace.end('controller', 'update')
         if all_escalated:
             for listener in self._teardown_listeners:
                 listener()
+            if self._write_batch != None:
+                self._write_batch.flush()
+            if self._read_cache != None:
+                self._read_cache.log_report(self._logger)
+            if self._write_batch != None:
+                self._write_batch.log_report(self._logger)
+            if self._write_cache != None:
+                self._write_cache.log_report(self._logger)
+            if self._recorder != None:
+                self._recorder.restore()
+            if self._latency_tracer != None:
+                self._latency_tracer.log_report(self._logger)
+                self._latency_tracer.restore()
+            if self._tracer:
+                self._tracer.restore()
+                self._tracer = None
+            if self._profiler:
+                self._profiler.log_report(self._logger)
+                self._profiler.restore()
+            if self._executor:
+                self._executor.shutdown()
+                self._executor = None
             self._update_listeners = []
             self._teardown_listeners = []
             self._layers = None
         return all_escalated
 
+    def _update_nodes(self, nodes, now, deferred, receivers):
+        """Processes the due layers among nodes, which must be in schedule order, and returns
+        whether all of them requested a task.
+
+        Tasks emitted during the pass to layers that override accept_tasks are collected in their
+        inboxes. Once it ends, the inboxes of receivers are handed over in that order.
+
+        If deferred is a list, completed tasks and task requests addressed to source layers are
+        appended to it as (index, source, task or None) tuples instead of being delivered.
+        """
+        all_escalated = True
+        # Every layer comes after all of its children, so one pass visits each layer at most once
+        # and only after every child has had the chance to request a task from it.
+        for node in nodes:
+            if not node.is_sink and not node.requests:
+                continue
+            node.requests = 0
+            if node.gated and not self._take_due(node, now):
+                # The layer keeps its outputs from the last time it was processed, and would
+                # request a task just as it did then.
+                escalate = node.escalated
+            else:
+                escalate = self._process_node(node, now, deferred)
+            if escalate:
+                for parent in node.parents:
+                    if deferred != None and parent.is_source:
+                        deferred.append((node.index, parent, None))
+                    else:
+                        parent.requests += 1
+            else:
+                all_escalated = False
+        # Children are processed before their parents, so no layer is processed again in the pass
+        # that sent it tasks.
+        for node in receivers:
+            if node.received:
+                self._deliver(node)
+        return all_escalated
+
+    def _deliver(self, node):
+        inbox = node.inbox
+        received = node.received
+        node.received = 0
+        node.layer.accept_tasks(inbox if received == len(inbox) else inbox[:received])
+        if self._event_driven:
+            node.dirty = True
+
+    def _process_node(self, node, now, deferred):
+        layer = node.layer
+        #self._logger.trace(f'Now processing {str(layer)}')
+        ctx = node.ctx
+        ctx.reset(now)
+        layer.process(ctx)
+        if self._debug_mode:
+            layer.process(ctx)
+            layer.process(ctx)
+            layer.process(ctx)
+
+        if ctx.completed:
+            for task in ctx.completed:
+                for parent in self._layers.get_task_parents(layer, type(task)):
+                    if deferred != None and self._nodes[parent].is_source:
+                        deferred.append((node.index, self._nodes[parent], task))
+                    else:
+                        self._complete_subtask(parent, task)
+        if ctx.subtasks:
+            for task in ctx.subtasks:
+                for child in self._layers.get_task_children(layer, type(task)):
+                    if self._batched and self._nodes[child].batched:
+                        self._nodes[child].receive(task)
+                    else:
+                        child.accept_task(task)
+                        if self._event_driven:
+                            self._nodes[child].dirty = True
+
+        node.escalated = ctx.escalate
+        return ctx.escalate
+
+    def _complete_subtask(self, parent, task):
+        parent.subtask_completed(task)
+        if self._event_driven:
+            self._nodes[parent].dirty = True
+
+    def _partition(self):
+        branch_ids = {}
+        for node in self._schedule:
+            if node.is_source or node in branch_ids:
+                continue
+            branch_id = len(set(branch_ids.values()))
+            stack = [node]
+            branch_ids[node] = branch_id
+            while stack:
+                current = stack.pop()
+                neighbors = (
+                    *current.parents,
+                    *(self._nodes[c] for c in self._layers.get_children(current.layer))
+                )
+                for neighbor in neighbors:
+                    if not neighbor.is_source and neighbor not in branch_ids:
+                        branch_ids[neighbor] = branch_id
+                        stack.append(neighbor)
+        branches = [[] for _ in set(branch_ids.values())]
+        for node in self._schedule:
+            if not node.is_source:
+                branches[branch_ids[node]].append(node)
+        if len(branches) < 2:
+            self._logger.info('Layer graph has no independent branches; processing serially')
+            return
+        self._branches = tuple(tuple(b) for b in branches)
+        self._sources = tuple(node for node in self._schedule if node.is_source)
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(self._workers, len(branches)),
+            thread_name_prefix='RobotController'
+        )
+
+    def _update_branches(self, now):
+        deferred = [[] for _ in self._branches]
+        # A layer with both a source parent and a branch parent receives tasks in both phases, so
+        # every inbox is only delivered after the sources pass, once and in schedule order, as in a
+        # serial update.
+        futures = [
+            self._executor.submit(self._update_nodes, branch, now, branch_deferred, ())
+            for branch, branch_deferred in zip(self._branches, deferred)
+        ]
+        # Waiting for every branch is the barrier ending the parallel phase.
+        all_escalated = True
+        for future in futures:
+            if not future.result():
+                all_escalated = False
+        # Replay what branches sent to sources in the order a serial update would have sent it.
+        for _, source, task in sorted((e for d in deferred for e in d), key=lambda e: e[0]):
+            if task == None:
+                source.requests += 1
+            else:
+                self._complete_subtask(source.layer, task)
+        if not self._update_nodes(self._sources, now, None, self._batched):
+            all_escalated = False
+        return all_escalated
+
+    def _take_due(self, node, now):
+        """Returns whether a gated layer should be processed in this update, consuming its period
+        deadline and any pending wakeup if so."""
+        if node.divisor > 1 and self._ticks % node.divisor:
+            return False
+        if node.period != None and now < node.next_due:
+            return False
+        if node.event_driven:
+            if not node.dirty and (node.wake_time == None or now < node.wake_time):
+                return False
+            node.dirty = False
+            node.wake_time = None
+        if node.period != None:
+            node.next_due += node.period
+            if node.next_due <= now:
+                node.next_due = now + node.period
+        return True
+
     def add_update_listener(self, listener):
         self._update_listeners.append(listener)
 
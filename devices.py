@@ -1,10 +1,200 @@
 from abc import ABC
 from abc import abstractmethod
+from array import array
 from log import Logger
 import math
 import time
 
 
+class WriteCache:
+    """Skips Robot writes that would not change the last value written to a key, within epsilon
+    for floats."""
+
+    # Keys the hardware changes on its own, which are always written.
+    VOLATILE_PREFIXES = ('enc_',)
+
+    def __init__(self, epsilon=None):
+        self._epsilon = epsilon
+        self._values = {}
+        self._writes = 0
+        self._saved = 0
+
+    def wrap_robot(self, robot):
+        """Returns a Robot that writes to robot through the cache."""
+        return _CachingRobot(robot, self)
+
+    def resync(self, device_id=None):
+        """Forgets the cached values of the given device, or of every device if device_id is
+        None."""
+        if device_id == None:
+            self._values.clear()
+        else:
+            for key in [k for k in self._values if k[0] == device_id]:
+                del self._values[key]
+
+    def get_write_count(self):
+        """Returns the number of writes passed on to the robot."""
+        return self._writes
+
+    def get_saved_count(self):
+        """Returns the number of writes skipped because they would not change the value."""
+        return self._saved
+
+    def log_report(self, logger):
+        logger.info(f'WriteCache: {self._writes} writes, {self._saved} saved')
+
+    def _should_write(self, device_id, key, value):
+        entry = (device_id, key)
+        values = self._values
+        if entry in values:
+            cached = values[entry]
+            if type(cached) is type(value) and (cached == value or (
+                self._epsilon != None
+                and type(value) is float
+                and abs(cached - value) <= self._epsilon
+            )):
+                self._saved += 1
+                return False
+        if not key.startswith(self.VOLATILE_PREFIXES):
+            values[entry] = value
+        self._writes += 1
+        return True
+
+
+class _CachingRobot:
+    """Wraps a Robot to skip set_value calls a WriteCache finds redundant."""
+
+    def __init__(self, robot, cache):
+        self._robot = robot
+        self._cache = cache
+
+    def get_value(self, device_id, key):
+        return self._robot.get_value(device_id, key)
+
+    def set_value(self, device_id, key, value):
+        if self._cache._should_write(device_id, key, value):
+            self._robot.set_value(device_id, key, value)
+
+
+class WriteBatch:
+    """Stages Robot writes during an update and writes the last value of each key when flushed."""
+
+    def __init__(self):
+        self._robot = None
+        self._staged = {}
+        self._stages = 0
+        self._writes = 0
+
+    def wrap_robot(self, robot):
+        """Returns a Robot that stages writes for robot until flush is called."""
+        self._robot = robot
+        return _BatchingRobot(robot, self)
+
+    def flush(self):
+        """Writes every staged value to the robot."""
+        staged = self._staged
+        if not staged:
+            return
+        set_value = self._robot.set_value
+        for (device_id, key), value in staged.items():
+            set_value(device_id, key, value)
+        self._writes += len(staged)
+        staged.clear()
+
+    def get_stage_count(self):
+        """Returns the number of writes staged."""
+        return self._stages
+
+    def get_write_count(self):
+        """Returns the number of writes flushed to the robot."""
+        return self._writes
+
+    def log_report(self, logger):
+        logger.info(f'WriteBatch: {self._stages} writes staged, {self._writes} flushed')
+
+
+class _BatchingRobot:
+    """Wraps a Robot to stage set_value calls in a WriteBatch."""
+
+    def __init__(self, robot, batch):
+        self._robot = robot
+        self._batch = batch
+
+    def get_value(self, device_id, key):
+        staged = self._batch._staged
+        if (device_id, key) in staged:
+            return staged[(device_id, key)]
+        return self._robot.get_value(device_id, key)
+
+    def set_value(self, device_id, key, value):
+        self._batch._staged[(device_id, key)] = value
+        self._batch._stages += 1
+
+
+class ReadCache:
+    """Serves repeated Robot reads of a key from a snapshot until invalidated."""
+
+    def __init__(self):
+        self._values = {}
+        self._reads = 0
+        self._hits = 0
+
+    def wrap_robot(self, robot):
+        """Returns a Robot that reads from robot through the cache."""
+        return _SnapshotRobot(robot, self)
+
+    def invalidate(self):
+        """Forgets every snapshot, so the next read of each key goes to the hardware."""
+        self._values.clear()
+
+    def get_read_count(self):
+        """Returns the number of reads passed on to the robot."""
+        return self._reads
+
+    def get_hit_count(self):
+        """Returns the number of reads served from a snapshot."""
+        return self._hits
+
+    def log_report(self, logger):
+        logger.info(f'ReadCache: {self._reads} reads, {self._hits} served from snapshot')
+
+
+class _SnapshotRobot:
+    """Wraps a Robot to serve get_value calls from a ReadCache."""
+
+    def __init__(self, robot, cache):
+        self._robot = robot
+        self._cache = cache
+
+    def get_value(self, device_id, key):
+        cache = self._cache
+        try:
+            value = cache._values[(device_id, key)]
+        except KeyError:
+            return self.get_fresh_value(device_id, key)
+        cache._hits += 1
+        return value
+
+    def get_fresh_value(self, device_id, key):
+        value = self._robot.get_value(device_id, key)
+        self._cache._reads += 1
+        self._cache._values[(device_id, key)] = value
+        return value
+
+    def set_value(self, device_id, key, value):
+        self._cache._values.pop((device_id, key), None)
+        self._robot.set_value(device_id, key, value)
+
+
+def _get_value(robot, device_id, key, fresh):
+    """Reads a value from robot, bypassing a ReadCache's snapshot if fresh is True."""
+    if fresh:
+        get_fresh_value = getattr(robot, 'get_fresh_value', None)
+        if get_fresh_value:
+            return get_fresh_value(device_id, key)
+    return robot.get_value(device_id, key)
+
+
 class DeviceConf(ABC):
     @abstractmethod
     def can_configure(self, cls) -> bool:
@@ -39,6 +229,12 @@ class Motor(Device):
         self._robot = robot
         self._controller = conf._controller
         self._motor = conf._channel
+        # The hot paths use prebuilt keys, bound robot methods and precomputed signs.
+        self._velocity_key = f"velocity_{self._motor}"
+        self._enc_key = f"enc_{self._motor}"
+        self._set_value = robot.set_value
+        self._get_value = robot.get_value
+        self._is_encoder_inverted = False
         self.set_invert(conf._invert)
         self.set_encoder_invert(conf._encoder_invert)
         if conf._deadband != None:
@@ -51,12 +247,18 @@ class Motor(Device):
     def set_invert(self, invert):
         self._set("invert", False)
         self._is_inverted = invert
+        self._update_signs()
         return self
 
     def set_encoder_invert(self, invert):
         self._is_encoder_inverted = invert
+        self._update_signs()
         return self
 
+    def _update_signs(self):
+        self._velocity_sign = -1 if self._is_inverted else 1
+        self._encoder_sign = self._velocity_sign * (-1 if self._is_encoder_inverted else 1)
+
     def set_deadband(self, deadband):
         self._set("deadband", deadband)
         return self
@@ -72,18 +274,21 @@ class Motor(Device):
         return self
 
     def set_velocity(self, velocity):
-        self._set("velocity", velocity * (-1 if self._is_inverted else 1))
+        self._set_value(self._controller, self._velocity_key, velocity * self._velocity_sign)
         return self
 
-    def get_velocity(self):
-        return self._get("velocity")
+    def get_velocity(self, fresh=False):
+        if fresh:
+            return self._get("velocity", fresh)
+        return self._get_value(self._controller, self._velocity_key)
 
-    def get_encoder(self):
-        return (self._get("enc") * (-1 if self._is_inverted else 1)
-            * (-1 if self._is_encoder_inverted else 1))
+    def get_encoder(self, fresh=False):
+        if fresh:
+            return self._get("enc", fresh) * self._encoder_sign
+        return self._get_value(self._controller, self._enc_key) * self._encoder_sign
 
-    def get_angle(self, ticks_per_rot):
-        return self.get_encoder() / ticks_per_rot * 2 * math.pi
+    def get_angle(self, ticks_per_rot, fresh=False):
+        return self.get_encoder(fresh) / ticks_per_rot * 2 * math.pi
 
     def reset_encoder(self):
         self._set("enc", 0)
@@ -91,23 +296,32 @@ class Motor(Device):
     def _set(self, key, value):
         self._robot.set_value(self._controller, f"{key}_{self._motor}", value)
 
-    def _get(self, key):
-        return self._robot.get_value(self._controller, f"{key}_{self._motor}")
+    def _get(self, key, fresh=False):
+        return _get_value(self._robot, self._controller, f"{key}_{self._motor}", fresh)
 
 
 class PidMotor(Motor):
-    """Adds custom PID control to a Motor since PiE's implementation is weird."""
+    """Adds custom PID control to a Motor since PiE's implementation is weird. Each control step
+    is O(1): the integral and derivative come from fixed-size ring buffers."""
 
-    def __init__(self, robot, conf, logger):
-        raise NotImplementedError('Need to change this to use hardware configuration')
-        super().__init__(robot, controller_id, motor, conf)
-        super().set_pid(None, None, None)
-        self._clear_samples()
-        self._max_samples = 200
-        self._derivative_samples = 20
-        self._held_position = None
-        self._last_timestamp = None
+    MAX_SAMPLES = 200
+    DERIVATIVE_SAMPLES = 20
+
+    def load_conf(self, robot, conf, logger):
         self._coeffs = None
+        self._held_position = None
+        self.set_window(self.MAX_SAMPLES, self.DERIVATIVE_SAMPLES)
+        super().load_conf(robot, conf, logger)
+
+    def set_window(self, max_samples, derivative_samples):
+        """Sets how many samples the integral covers and how many steps back the derivative is
+        measured over, which must be fewer. Clears the samples."""
+        if not 0 < derivative_samples < max_samples:
+            raise ValueError('Need 0 < derivative_samples < max_samples')
+        self._max_samples = max_samples
+        self._derivative_samples = derivative_samples
+        self._clear_samples()
+        return self
 
     def set_velocity(self, velocity):
         self._held_position = None # force clear on next hold_position call
@@ -115,7 +329,8 @@ class PidMotor(Motor):
         return self
 
     def set_pid(self, p, i, d):
-        if not all(p, i, d):
+        super().set_pid(None, None, None)
+        if None in (p, i, d):
             self._coeffs = None # unspecified or incomplete set
         else:
             self._coeffs = (p, i, d)
@@ -126,41 +341,69 @@ class PidMotor(Motor):
         self._held_position = pos
         return self
 
-    def hold_position(self):
+    def hold_position(self, now=None):
+        """Drives the motor towards the position given to set_position, taking a sample at now,
+        in seconds, or at the current monotonic time if now is None."""
         if not self._coeffs:
             raise RuntimeError("PID coefficients not set.")
-        self._record_sample()
-        super().set_velocity(self._calc_proportional(self._held_position)
-            + self._calc_integral(self._held_position) + self._calc_derivative())
+        if self._held_position == None:
+            raise RuntimeError("No position to hold.")
+        if now == None:
+            now = time.monotonic()
+        error = self._held_position - self.get_encoder()
+        errors = self._errors
+        times = self._times
+        areas = self._areas
+        size = self._max_samples
+        cur = self._cur_sample
+        count = self._count
+
+        if count:
+            prev = cur - 1
+            area = (error + errors[prev]) / 2 * (now - times[prev])
+        else:
+            area = 0.0
+        # Until the buffer fills, the slot being replaced holds 0.
+        self._integral += area - areas[cur]
+        areas[cur] = area
+        errors[cur] = error
+        times[cur] = now
+        if count < size:
+            count += 1
+            self._count = count
+
+        back = min(self._derivative_samples, count - 1)
+        derivative = 0.0
+        if back:
+            old = cur - back
+            elapsed = now - times[old]
+            if elapsed > 0:
+                derivative = (error - errors[old]) / elapsed
+
+        cur += 1
+        if cur == size:
+            cur = 0
+            # Re-sum once per lap so rounding in the running total cannot build up.
+            self._integral = math.fsum(areas)
+        self._cur_sample = cur
+
+        p, i, d = self._coeffs
+        output = p * error + i * self._integral + d * derivative
+        super().set_velocity(max(-1.0, min(1.0, output)))
         return self
 
-    def _record_sample(self):
-        self._enc_samples[self._cur_sample] = self.get_encoder()
-        timestamp = time.time()
-        self._time_samples[self._cur_sample] = timestamp - (self._last_timestamp or 0)
-        self._last_timestamp = timestamp
-        self._cur_sample += 1
-        if self._cur_sample == self._max_samples:
-            self._cur_sample = 0
+    def get_integral(self):
+        """Returns the integral of the position error over the sample window."""
+        return self._integral
 
     def _clear_samples(self):
-        self._enc_samples = []
-        self._time_samples = []
+        zeros = bytes(8 * self._max_samples)
+        self._errors = array('d', zeros)
+        self._times = array('d', zeros)
+        self._areas = array('d', zeros)
         self._cur_sample = 0
-
-    def _calc_proportional(self):
-        return self._coeffs[0] * (self.get_encoder() - self._held_position)
-
-    def _calc_integral(self):
-        return self._coeffs[1] * sum((enc - self._held_position) * time for (enc, time)
-            in zip(self._enc_samples, self._time_samples))
-
-    def _calc_derviative(self):
-        avg_deriv = sum(
-            ((self._enc_samples[self._cur_sample] - self._enc_samples[self._cur_sample - i])
-            / (self._time_samples[self._cur_sample] - self._time_samples[self._cur_sample - i]))
-            for i in range(self._deriv_samples)) / self._deriv_samples
-        return self._coeffs[2] * avg_deriv
+        self._count = 0
+        self._integral = 0.0
 
 
 class MotorPair(Motor):
@@ -213,9 +456,11 @@ class Servo(Device):
         self._robot = robot
         self._controller = conf._controller
         self._servo = conf._channel
+        self._position_key = "servo" + self._servo
+        self._set_value = robot.set_value
 
     def set_position(self, position):
-        self._robot.set_value(self._controller, "servo" + self._servo, position)
+        self._set_value(self._controller, self._position_key, position)
 
 
 class DistanceSensorConf(DeviceConf):
@@ -233,9 +478,12 @@ class DistanceSensor(Device):
         self._robot = robot
         self._device = conf._id
         self._low_threshold = conf._noise_threshold
+        self._get_value = robot.get_value
 
-    def can_read(self):
-        return self.get_distance() > self._low_threshold
+    def can_read(self, fresh=False):
+        return self.get_distance(fresh) > self._low_threshold
 
-    def get_distance(self):
-        return self._robot.get_value(self._device, "distance")
+    def get_distance(self, fresh=False):
+        if fresh:
+            return _get_value(self._robot, self._device, "distance", fresh)
+        return self._get_value(self._device, "distance")
@@ -1,7 +1,9 @@
 from abc import ABC
 from abc import abstractmethod
+from collections import deque
 from task import Task
 from task import WinTask
+from time import monotonic
 
 
 class LayerSetupInfo:
@@ -38,10 +40,13 @@ class LayerSetupInfo:
 
 
 class LayerProcessContext:
-    def __init__(self, emit_subtask_hook, complete_task_hook, request_task_hook):
+    def __init__(self, emit_subtask_hook, complete_task_hook, request_task_hook,
+            request_wakeup_hook=None, time=None):
         self._emit_subtask_hook = emit_subtask_hook
         self._complete_task_hook = complete_task_hook
         self._request_task_hook = request_task_hook
+        self._request_wakeup_hook = request_wakeup_hook
+        self._time = time
 
     def emit_subtask(self, subtask):
         self._emit_subtask_hook(subtask)
@@ -52,11 +57,65 @@ class LayerProcessContext:
     def request_task(self):
         self._request_task_hook()
 
+    def request_wakeup(self, delay):
+        """Asks for an event-driven layer to be processed again after delay seconds even if no
+        task arrives in the meantime. Has no effect on other layers, which are processed every
+        update anyway."""
+        if self._request_wakeup_hook:
+            self._request_wakeup_hook(delay)
+
+    def get_time(self):
+        """Returns the monotonic time in seconds sampled once at the start of the current update,
+        so layers can share one clock read per tick, or the current monotonic time if the context
+        was built without one."""
+        if self._time == None:
+            return monotonic()
+        return self._time
+
+
+class ForwardingContext:
+    """Forwards every LayerProcessContext call to the context set as _inner. Instrumentation
+    subclasses it to intercept some of the calls a layer makes."""
+
+    def __init__(self):
+        self._inner = None
+
+    def emit_subtask(self, subtask):
+        self._inner.emit_subtask(subtask)
+
+    def complete_task(self, task):
+        self._inner.complete_task(task)
+
+    def request_task(self):
+        self._inner.request_task()
+
+    def request_wakeup(self, delay):
+        self._inner.request_wakeup(delay)
+
+    def get_time(self):
+        return self._inner.get_time()
+
 
 class Layer(ABC):
     def setup(self, setup_info: LayerSetupInfo) -> None:
         pass
 
+    def is_event_driven(self) -> bool:
+        """Returns whether the layer only needs processing after it accepts a task, has a subtask
+        completed, or reaches a time requested with LayerProcessContext.request_wakeup. Only
+        honored by a RobotController with event-driven execution enabled; otherwise every layer is
+        processed whenever it is due."""
+        return False
+
+    def get_period(self) -> float | None:
+        """Returns the minimum number of seconds between process calls, or None to be processed
+        whenever due. While skipped, the layer's last emitted tasks stay in effect."""
+        return None
+
+    def get_tick_divisor(self) -> int:
+        """Returns n to be processed on only every nth update."""
+        return 1
+
     @abstractmethod
     def get_input_tasks(self) -> set[Task]:
         raise NotImplementedError
@@ -76,6 +135,13 @@ class Layer(ABC):
     def accept_task(self, task: Task) -> None:
         raise NotImplementedError
 
+    def accept_tasks(self, batch: list[Task]) -> None:
+        """Accepts every task sent to the layer during one update, in the order they were sent.
+        RobotController calls this once per update for a layer that overrides it, instead of
+        calling accept_task once per task. The batch list is reused, so copy it to keep it."""
+        for task in batch:
+            self.accept_task(task)
+
 
 class AbstractFunctionLayer(Layer):
     def __init__(self):
@@ -103,15 +169,61 @@ class AbstractFunctionLayer(Layer):
         self._emitted_subtask = False
         self._subtask_completed = False
 
+    def accept_tasks(self, batch):
+        # Only the last mapped subtask is emitted, so map just the latest task of each type, in
+        # the order those arrived.
+        if len(batch) == 1:
+            self.accept_task(batch[0])
+            return
+        latest = {}
+        for task in batch:
+            latest.pop(type(task), None)
+            latest[type(task)] = task
+        for task in latest.values():
+            self.accept_task(task)
+
     @abstractmethod
     def map(self, task):
         raise NotImplementedError
 
 
-class AbstractQueuedLayer(Layer):
+class AbstractMemoizedFunctionLayer(AbstractFunctionLayer):
+    """An AbstractFunctionLayer that only emits a mapped subtask when it differs from the last one
+    it emitted, so downstream layers are not sent the same command every update while the input
+    holds still. Accepted tasks whose mapped subtask is equal to the last one are completed on the
+    next process without emitting anything, so map must return tasks with value equality, such as
+    ValueTask subclasses."""
+
     def __init__(self):
+        super().__init__()
+        self._last_emitted = None
+
+    def process(self, ctx):
+        if not self._emitted_subtask:
+            self._last_emitted = self._subtask
+        super().process(ctx)
+
+    def accept_task(self, task):
+        super().accept_task(task)
+        if self._subtask == self._last_emitted:
+            self._emitted_subtask = True
+            self._subtask_completed = True
+
+
+class AbstractQueuedLayer(Layer):
+    """Emits the subtasks map_to_subtasks returns for each accepted task one at a time, each once
+    the previous one is completed, and completes the task after the last.
+
+    map_to_subtasks may return any iterable, including a generator, and is only advanced as far
+    as needed: by default each subtask is generated when it is emitted. With a lookahead, the layer
+    keeps up to that many subtasks generated ahead of the one in flight, and refills that buffer
+    after emitting, so generators must not depend on state the subtask in flight changes.
+    """
+
+    def __init__(self, lookahead=0):
+        self._lookahead = lookahead
         self._subtask_iter = None
-        self._next_subtask = None
+        self._queue = deque()
         self._task = None
         self._emitted = None
 
@@ -119,78 +231,169 @@ class AbstractQueuedLayer(Layer):
         self._logger = setup_info.get_logger('AbstractQueuedLayer')
 
     def subtask_completed(self, task):
-        if self._emitted == task:
-            self._advance()
-            #self._logger.warn('subtask completed, will emit on next process')
-
-    def _advance(self):
-        if not self._next_subtask:
-            self._next_subtask = next(self._subtask_iter, None)
-            if not self._next_subtask:
+        if self._emitted is task:
+            self._emitted = None
+
+    def _prefetch(self, count):
+        queue = self._queue
+        while len(queue) < count and self._subtask_iter:
+            subtask = next(self._subtask_iter, None)
+            if subtask == None:
                 self._subtask_iter = None
+            else:
+                queue.append(subtask)
 
     def process(self, ctx):
-        if not self._subtask_iter:
-            if self._task:
+        if self._task and self._emitted == None:
+            self._prefetch(1)
+            if self._queue:
+                self._emitted = self._queue.popleft()
+                ctx.emit_subtask(self._emitted)
+            else:
                 ctx.complete_task(self._task)
                 self._task = None
+        if not self._task:
             ctx.request_task()
-        if self._next_subtask:
-            #self._logger.info('emitting')
-            ctx.emit_subtask(self._next_subtask)
-            self._emitted = self._next_subtask
-            self._next_subtask = None
+        self._prefetch(self._lookahead)
 
     def accept_task(self, task):
         self._task = task
         self._subtask_iter = iter(self.map_to_subtasks(task))
-        self._advance()
+        self._queue.clear()
+        self._emitted = None
 
     @abstractmethod
     def map_to_subtasks(self, task):
         raise NotImplementedError
 
 
-class SequenceLayer(Layer):
+class _ChildContext(ForwardingContext):
+    """Forwards a child layer's calls to the context its combinator was processed with, noting
+    when the child completes the task it was given."""
+
+    def __init__(self, owner, child):
+        super().__init__()
+        self._owner = owner
+        self._child = child
+        self.done = False
+
+    def emit_subtask(self, subtask):
+        self._owner._emitters[id(subtask)] = (subtask, self._child)
+        self._inner.emit_subtask(subtask)
+
+    def complete_task(self, task):
+        self.done = True
+
+    def request_task(self):
+        pass
+
+
+class _CompositeLayer(Layer):
     def __init__(self, layers):
         self._layers = layers
-        self._layer = None
-        self._logger = None
+        self._contexts = [_ChildContext(self, layer) for layer in layers]
+        self._emitters = {}
+        self._task = None
 
     def setup(self, setup_info):
-        for l in self._layers:
-            l.setup(setup_info)
+        for layer in self._layers:
+            layer.setup(setup_info)
+
+    def get_input_tasks(self):
+        return set().union(*(layer.get_input_tasks() for layer in self._layers))
+
+    def get_output_tasks(self):
+        return set().union(*(layer.get_output_tasks() for layer in self._layers))
 
     def subtask_completed(self, task):
-        self._layer.subtask_completed(task)
+        emitter = self._emitters.pop(id(task), None)
+        if emitter != None and emitter[0] is task:
+            emitter[1].subtask_completed(task)
+
+    def _start(self, index):
+        self._contexts[index].done = False
+        self._layers[index].accept_task(self._task)
+
+    def _process_child(self, index, ctx):
+        child_ctx = self._contexts[index]
+        child_ctx._inner = ctx
+        self._layers[index].process(child_ctx)
+        return child_ctx.done
+
+    def _finish(self, ctx):
+        # Subtasks of children that have stopped are no longer waited on.
+        self._emitters.clear()
+        ctx.complete_task(self._task)
+        self._task = None
+        ctx.request_task()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._layers})'
+
+    def __str__(self):
+        return f'{type(self).__name__}({[str(l) for l in self._layers]})'
+
+
+class SequenceLayer(_CompositeLayer):
+    """Runs its child layers one after another on each task it accepts. The task is sent to the
+    first child, and to each following child in the same update the previous one completes it.
+    The sequence completes the task once the last child has."""
+
+    def __init__(self, layers):
+        super().__init__(layers)
+        self._index = 0
 
     def process(self, ctx):
-        if not self._layer:
-            self._layer = next(self._layer_iter, None)
-            if not self._layer:
-                if self._task:
-                    ctx.complete_task(self._task)
-                return
-        wrapped_ctx = LayerProcessContext(
-            lambda t: ctx.emit_subtask(t),
-            lambda t: self._advance(),
-        )
-        self._layer.process(wrapped_ctx)
-
-    def _advance(self):
-        self._layer = None
+        if self._task == None:
+            ctx.request_task()
+            return
+        layers = self._layers
+        while self._index < len(layers) and self._process_child(self._index, ctx):
+            self._index += 1
+            if self._index < len(layers):
+                self._start(self._index)
+        if self._index == len(layers):
+            self._finish(ctx)
 
     def accept_task(self, task):
         self._task = task
-        for layer in self._layers:
-            self._layers.accept_task(task)
-        self._layer_iter = iter(self._layers)
+        self._emitters.clear()
+        self._index = 0
+        if self._layers:
+            self._start(0)
 
-    def __repr__(self):
-        return f'SequenceLayer({self._layers})'
 
-    def __str__(self):
-        return f'SequenceLayer({[str(l) for l in self._layers]})'
+class ParallelLayer(_CompositeLayer):
+    """Runs its child layers side by side on each task it accepts, processing every unfinished
+    child each time it is processed, so one node can drive while it runs a belt. The task is
+    completed once every child has completed it, or once any child has if wait_for_all is False;
+    children still running then are simply not processed again until the next task."""
+
+    def __init__(self, layers, wait_for_all=True):
+        super().__init__(layers)
+        self._wait_for_all = wait_for_all
+        self._running = []
+
+    def process(self, ctx):
+        if self._task == None:
+            ctx.request_task()
+            return
+        running = self._running
+        finished = False
+        for index in list(running):
+            if self._process_child(index, ctx):
+                running.remove(index)
+                finished = True
+        if not running or (finished and not self._wait_for_all):
+            running.clear()
+            self._finish(ctx)
+
+    def accept_task(self, task):
+        self._task = task
+        self._emitters.clear()
+        self._running = list(range(len(self._layers)))
+        for index in self._running:
+            self._start(index)
 
 
 class WinLayer(Layer):
@@ -80,8 +80,9 @@ class TwoWheelDrive(Layer):
             right_delta = self._right_wheel.get_distance() - self._right_start_pos
             right_done = ((right_delta < 0) == (self._right_goal_delta < 0)
                 and abs(right_delta) >= abs(self._right_goal_delta))
-            if time.time() - self._last_printed > 1:
-                self._last_printed = time.time()
+            now = ctx.get_time()
+            if now - self._last_printed > 1:
+                self._last_printed = now
                 self._logger.info(f'left {left_delta} left goal {self._left_goal_delta} right {right_delta} right goal {self._right_goal_delta}')
             if left_done and right_done:
                 self._should_request_task = True
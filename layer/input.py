@@ -1,11 +1,16 @@
 from layer import Layer
+from task import TaskPool
 from task.input import GamepadInputTask
 from task.input import KeyboardInputTask
 
 
 class GamepadInputGenerator(Layer):
-    def __init__(self, gamepad):
+    def __init__(self, gamepad, pool_size=None):
+        """Reads gamepad into a new GamepadInputTask on every process call, or into one recycled
+        from a TaskPool of pool_size tasks if pool_size is given."""
         self._gamepad = gamepad
+        self._pool = (TaskPool(GamepadInputTask.create_idle, pool_size)
+            if pool_size != None else None)
 
     def get_input_tasks(self):
         return set()
@@ -14,7 +19,15 @@ class GamepadInputGenerator(Layer):
         return {GamepadInputTask}
 
     def process(self, ctx):
-        ctx.emit_subtask(GamepadInputTask(
+        if self._pool:
+            task = self._pool.acquire()
+            task.set(*self._read())
+        else:
+            task = GamepadInputTask(*self._read())
+        ctx.emit_subtask(task)
+
+    def _read(self):
+        return (
             self._gamepad.get_value('joystick_left_x'),
             -self._gamepad.get_value('joystick_left_y'),
             self._gamepad.get_value('l_bumper'),
@@ -31,19 +44,14 @@ class GamepadInputGenerator(Layer):
             self._gamepad.get_value('button_b'),
             self._gamepad.get_value('button_x'),
             self._gamepad.get_value('button_y'),
-        ))
+        )
 
     def accept_task(self, task):
         raise TypeError
 
 
 class KeyboardInputGenerator(Layer):
-    KEYS = list("abcdefghijklmnopqrstuvwxyz0123456789,./;'[]") + [
-        'left_arrow',
-        'right_arrow',
-        'up_arrow',
-        'down_arrow'
-    ]
+    KEYS = KeyboardInputTask.KEYS
 
     def __init__(self, keyboard):
         self._keyboard = keyboard
@@ -56,7 +64,8 @@ class KeyboardInputGenerator(Layer):
         return {GamepadInputTask}
 
     def process(self, ctx):
-        ctx.emit_subtask(KeyboardInputTask({k: self._keyboard.get_value(k) for k in self.KEYS}))
+        get_value = self._keyboard.get_value
+        ctx.emit_subtask(KeyboardInputTask(tuple(map(get_value, self.KEYS))))
 
     def accept_task(self, task):
         raise TypeError
@@ -1,4 +1,5 @@
 from layer import AbstractFunctionLayer
+from layer import AbstractMemoizedFunctionLayer
 from task.drive import HolonomicDriveTask
 from task.drive import TankDriveTask
 from task.input import GamepadInputTask
@@ -8,7 +9,7 @@ from task.manipulator import DriveWheelBeltTask
 from task.manipulator import DriveButtonPusherTask
 
 
-class TankDriveMapping(AbstractFunctionLayer):
+class TankDriveMapping(AbstractMemoizedFunctionLayer):
     def get_input_tasks(self):
         return {GamepadInputTask, KeyboardInputTask}
 
@@ -22,7 +23,7 @@ class TankDriveMapping(AbstractFunctionLayer):
             return TankDriveTask(task.get('w') - task.get('s'), task.get('i') - task.get('k'))
 
 
-class ZeldaDriveMapping(AbstractFunctionLayer):
+class ZeldaDriveMapping(AbstractMemoizedFunctionLayer):
     def setup(self, setup_info):
         self._logger = setup_info.get_logger('ZeldaDriveMapping')
         self._gp_fwd = 0
@@ -52,7 +53,7 @@ class ZeldaDriveMapping(AbstractFunctionLayer):
         return TankDriveTask(left, right)
 
 
-class DpadBeltMapping(AbstractFunctionLayer):
+class DpadBeltMapping(AbstractMemoizedFunctionLayer):
     def __init__(self, is_wheel_belt):
         super().__init__()
         self._is_wheel_belt = is_wheel_belt
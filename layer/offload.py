@@ -0,0 +1,91 @@
+from abc import abstractmethod
+from layer import Layer
+from multiprocessing import get_context
+
+
+class AbstractOffloadedLayer(Layer):
+    """A layer whose heavy computation runs in a worker process instead of on the control loop.
+
+    Whenever the layer is processed with no computation in flight, it sends the worker a snapshot
+    of its inputs from get_snapshot. The worker calls compute on the snapshot, and once the result
+    arrives on a later tick it is passed to process_result to emit tasks from. Until then, the
+    tasks emitted for the previous result stay in effect.
+
+    The worker is forked from the layer during setup, so compute sees the layer as it was then and
+    should only depend on the snapshot and state that never changes afterwards. Snapshots and
+    results must be picklable. Where fork is unavailable, compute runs inline instead.
+    """
+
+    def setup(self, setup_info):
+        self._offload_logger = setup_info.get_logger('AbstractOffloadedLayer')
+        self._conn = None
+        self._worker = None
+        self._pending = False
+        try:
+            mp_context = get_context('fork')
+        except ValueError:
+            self._offload_logger.warn('Cannot fork a worker process; computing inline')
+            return
+        self._conn, worker_conn = mp_context.Pipe()
+        self._worker = mp_context.Process(
+            target=self._run_worker,
+            args=(worker_conn,),
+            daemon=True
+        )
+        self._worker.start()
+        worker_conn.close()
+        setup_info.add_teardown_listener(self.stop_worker)
+
+    def process(self, ctx):
+        if self._pending and self._conn.poll():
+            self._pending = False
+            ok, result = self._conn.recv()
+            if not ok:
+                raise RuntimeError(f'Offloaded computation failed: {result}')
+            self.process_result(result, ctx)
+        if not self._pending:
+            snapshot = self.get_snapshot()
+            if snapshot != None:
+                if self._worker:
+                    self._conn.send(snapshot)
+                    self._pending = True
+                else:
+                    self.process_result(self.compute(snapshot), ctx)
+        if self._pending:
+            # Keeps polling for the result if event-driven.
+            ctx.request_wakeup(0)
+
+    def stop_worker(self):
+        if self._worker:
+            self._conn.send(None)
+            self._worker.join(1)
+            if self._worker.is_alive():
+                self._worker.kill()
+            self._conn.close()
+            self._worker = None
+            self._pending = False
+
+    def _run_worker(self, conn):
+        while True:
+            snapshot = conn.recv()
+            if snapshot == None:
+                break
+            try:
+                conn.send((True, self.compute(snapshot)))
+            except Exception as e:
+                conn.send((False, repr(e)))
+
+    @abstractmethod
+    def get_snapshot(self):
+        """Returns the inputs for the next computation, or None if there is nothing to compute."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def compute(self, snapshot):
+        """Returns the result of the computation on snapshot. Runs in the worker process."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def process_result(self, result, ctx):
+        """Emits tasks, completes tasks or requests a task for a finished computation's result."""
+        raise NotImplementedError
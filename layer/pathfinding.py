@@ -6,7 +6,6 @@ from math import inf
 from math import sin
 from math import sqrt
 from matrix import Mat3
-from os import time
 from task import MoveToFieldTask
 from task import UnsupportedTaskError
 
@@ -40,7 +39,7 @@ class DynwinPathfinder(Layer):
         self._initial_transform = None
 
     def complete_task(self, task):
-        if task == self._emitted_task:
+        if task is self._emitted_task:
             self._should_emit = True
 
     def process(self, ctx):
@@ -55,7 +54,7 @@ class DynwinPathfinder(Layer):
                 self._should_emit = False
             ctx.request_task()
         if self._should_emit:
-            now = time()
+            now = ctx.get_time()
             if now - self._last_calc_time > self.CALCULATE_INTERVAL:
                 self._calculate_path()
                 self._last_calc_time = now
@@ -145,7 +144,7 @@ class DynwinPathfinder(Layer):
             best_trajectory = Trajectory(0, 0, 1)
         self._current_trajectory = best_trajectory
 
-    def _check_dynamic_window(self, t) {
+    def _check_dynamic_window(self, t):
         for frac in range(0, 1, self._CLEARENCE_STEP):
             translation = self._get_trajectory_transform(t, frac).get_translation()
             for obstacle in self._obstacles:
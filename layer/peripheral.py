@@ -18,6 +18,9 @@ class BeltLayer(Layer):
     def get_output_tasks(self):
         return set()
 
+    def is_event_driven(self):
+        return True
+
     def process(self, ctx):
         if self._task:
             ctx.complete_task(self._task)
@@ -41,6 +44,9 @@ class WheelBeltLayer(Layer):
     def get_output_tasks(self):
         return set()
 
+    def is_event_driven(self):
+        return True
+
     def process(self, ctx):
         if self._task:
             ctx.complete_task(self._task)
@@ -67,6 +73,9 @@ class ButtonPusherLayer(Layer):
     def get_output_tasks(self):
         return set()
 
+    def is_event_driven(self):
+        return True
+
     def process(self, ctx):
         if self._init:
             self._init = False
@@ -22,7 +22,7 @@ class RatStrategy(Layer):
         return {TankDriveTask}
 
     def subtask_completed(self, task):
-        if task == self._emitted_task:
+        if task is self._emitted_task:
             self._emitted_task = None
 
     def process(self, ctx):
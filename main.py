@@ -8,6 +8,7 @@ from log import FilterBackend
 from log import Logger
 from log import LoggerProvider
 from log import StdioBackend
+from rate import FixedRateRunner
 
 # CONFIG. CHANGE THESE.
 conf = hwconf.spring_2025
@@ -48,11 +49,19 @@ def get_robot_interfaces(use_input, robot_spec):
 
     return (logger_provider, robot, conf, gamepad, keyboard)
 
+def run_opmode(opmode, logger_provider):
+    FixedRateRunner(
+        opmode.get_loop_rate(),
+        opmode.get_overrun_policy(),
+        logger_provider.get_logger('FixedRateRunner'),
+        report_interval=30,
+    ).run(opmode.loop)
+
 @_PREP_ENTRY_POINT
 def autonomous():
-    auto_opmode.setup(*get_robot_interfaces(False, auto_opmode.get_robot_spec()))
-    while True:
-        auto_opmode.loop()
+    interfaces = get_robot_interfaces(False, auto_opmode.get_robot_spec())
+    auto_opmode.setup(*interfaces)
+    run_opmode(auto_opmode, interfaces[0])
 
 @_PREP_ENTRY_POINT
 def autonomous_setup():
@@ -64,9 +73,9 @@ def autonomous_main():
 
 @_PREP_ENTRY_POINT
 def teleop():
-    teleop_opmode.setup(*get_robot_interfaces(True, teleop_opmode.get_robot_spec()))
-    while True:
-        teleop_opmode.loop()
+    interfaces = get_robot_interfaces(True, teleop_opmode.get_robot_spec())
+    teleop_opmode.setup(*interfaces)
+    run_opmode(teleop_opmode, interfaces[0])
 
 @_PREP_ENTRY_POINT
 def teleop_setup():
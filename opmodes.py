@@ -2,6 +2,9 @@ from abc import ABC
 from abc import abstractmethod
 from controller import LayerGraph
 from controller import RobotController
+from devices import ReadCache
+from devices import WriteBatch
+from devices import WriteCache
 from layer import AbstractQueuedLayer
 from layer import WinLayer
 from layer.drive import TwoWheelDrive
@@ -16,6 +19,7 @@ from layer.peripheral import ButtonPusherLayer
 from layer.peripheral import WheelBeltLayer
 from layer.strategy import RatStrategy
 from log import LoggerProvider
+from rate import FixedRateRunner
 from task import WinTask
 from task.drive import AxialMovementTask
 from task.drive import TurnTask
@@ -37,6 +41,22 @@ class AbstractOpmode(ABC):
     def configure_logger(self, logger):
         pass
 
+    def configure_controller(self, controller):
+        pass
+
+    def get_trace_buffer(self):
+        """Returns a TraceBuffer to record loop, layer and device call spans into, or None to
+        disable tracing. Export it with TraceBuffer.export_chrome_trace."""
+        return None
+
+    def get_loop_rate(self):
+        """Returns the rate in Hz to call loop at, or None to call it as fast as possible."""
+        return 100
+
+    def get_overrun_policy(self):
+        """Returns the FixedRateRunner policy for ticks that run past the next deadline."""
+        return FixedRateRunner.DROP
+
     @abstractmethod
     def get_robot_spec(self):
         pass
@@ -50,6 +70,9 @@ class AbstractOpmode(ABC):
 
         localizer = self.get_localizer()
 
+        self._trace = self.get_trace_buffer()
+        self._controller.trace(self._trace)
+        self.configure_controller(self._controller)
         self._controller.setup(
             robot,
             hw_conf,
@@ -62,12 +85,16 @@ class AbstractOpmode(ABC):
         self._init_time = time.time()
 
     def loop(self):
+        if self._trace != None:
+            self._trace.begin('opmode', 'loop')
         if self._init_time and time.time() - self._init_time > 5:
             self._logger.log('Robot is alive 5 seconds into opmode')
             self._init_time = None
         if not self._finished and self._controller.update():
             self._logger.warn('Opmode finished.')
             self._finished = True
+        if self._trace != None:
+            self._trace.end('opmode', 'loop')
 
 
 class TwoWheelDriveTeleopOpmode(AbstractOpmode):
@@ -85,6 +112,12 @@ class TwoWheelDriveTeleopOpmode(AbstractOpmode):
 
 
 class TWDPeripheralsTeleopOpmode(AbstractOpmode):
+    def configure_controller(self, controller):
+        controller.event_driven(True)
+        controller.cache_writes(WriteCache(epsilon=1e-3))
+        controller.cache_reads(ReadCache())
+        controller.batch_writes(WriteBatch())
+
     def get_layers(self, gamepad, keyboard):
         lg = LayerGraph()
         zelda = ZeldaDriveMapping()
@@ -137,10 +170,16 @@ class SampleProgrammedDriveLayer(AbstractQueuedLayer):
 
     def map_to_subtasks(self, task):
         assert(isinstance(task, WinTask))
-        return [AxialMovementTask(1), TurnTask(math.pi / 2)] * 4
+        for _ in range(4):
+            yield AxialMovementTask(1)
+            yield TurnTask(math.pi / 2)
 
 
 class RatAutonomousOpmode(AbstractOpmode):
+    def configure_controller(self, controller):
+        controller.cache_reads(ReadCache())
+        controller.batch_writes(WriteBatch())
+
     def get_layers(self, gamepad, keyboard):
         lg = LayerGraph()
         lg.add_chain([WinLayer(), RatStrategy(), TwoWheelDrive()])
@@ -0,0 +1,173 @@
+from layer import ForwardingContext
+from time import perf_counter
+
+
+def get_layer_labels(layers):
+    """Returns a label for each of layers: its type name, numbered as Name[i] if several layers
+    share the type."""
+    names = [type(layer).__name__ for layer in layers]
+    totals = {}
+    for name in names:
+        totals[name] = totals.get(name, 0) + 1
+    seen = {}
+    labels = []
+    for name in names:
+        if totals[name] > 1:
+            seen[name] = seen.get(name, -1) + 1
+            name = f'{name}[{seen[name]}]'
+        labels.append(name)
+    return labels
+
+
+class ShadowedMethods:
+    """Replaces methods of layers with wrappers set on the instance, so uninstrumented layers run
+    exactly the code they would without instrumentation, and puts back whatever was there
+    before."""
+
+    def __init__(self):
+        self._saved = {}
+
+    def shadow(self, layer, name, wrapper):
+        saved = self._saved.setdefault(layer, {})
+        if name not in saved:
+            saved[name] = vars(layer).get(name)
+        setattr(layer, name, wrapper)
+
+    def restore(self):
+        for layer, saved in self._saved.items():
+            for name, method in saved.items():
+                delattr(layer, name)
+                if method != None:
+                    setattr(layer, name, method)
+        self._saved = {}
+
+
+class RollingHistogram:
+    """Keeps the most recent samples of a measurement in a fixed-size window."""
+
+    def __init__(self, window=1024):
+        self._samples = [0.0] * window
+        self._window = window
+        self._next = 0
+        self._count = 0
+
+    def record(self, sample):
+        self._samples[self._next] = sample
+        self._next += 1
+        if self._next == self._window:
+            self._next = 0
+        self._count += 1
+
+    def get_count(self):
+        """Returns the total number of samples recorded, including ones outside the window."""
+        return self._count
+
+    def percentile(self, fraction):
+        """Returns the sample at the given fraction (0 to 1) of the window, or None if empty."""
+        filled = min(self._count, self._window)
+        if not filled:
+            return None
+        samples = sorted(self._samples[:filled])
+        return samples[round(fraction * (filled - 1))]
+
+    def get_max(self):
+        filled = min(self._count, self._window)
+        return max(self._samples[:filled]) if filled else None
+
+    def __str__(self):
+        if not self._count:
+            return 'n=0'
+        return (f'n={self._count} p50={self.percentile(0.5) * 1e6:.1f}us '
+            f'p99={self.percentile(0.99) * 1e6:.1f}us max={self.get_max() * 1e6:.1f}us')
+
+
+class LayerStats:
+    """Call timings and task counts for one layer."""
+
+    def __init__(self, label, window):
+        self._label = label
+        self.process = RollingHistogram(window)
+        self.accept_task = RollingHistogram(window)
+        self.subtask_completed = RollingHistogram(window)
+        self.emitted = 0
+        self.completed = 0
+
+    def get_label(self):
+        return self._label
+
+    def __str__(self):
+        return (f'{self._label}: process {self.process}; accept_task {self.accept_task}; '
+            f'subtask_completed {self.subtask_completed}; emitted {self.emitted} '
+            f'completed {self.completed}')
+
+
+class LayerProfiler:
+    """Times each call a RobotController makes into its layers' process, accept_task and
+    subtask_completed methods."""
+
+    def __init__(self, window=1024):
+        self._window = window
+        self._stats = {}
+        self._shadowed = ShadowedMethods()
+
+    def instrument(self, layers):
+        shadow = self._shadowed.shadow
+        for layer, name in zip(layers, get_layer_labels(layers)):
+            stats = LayerStats(name, self._window)
+            self._stats[layer] = stats
+            shadow(layer, 'process', self._wrap_process(layer.process, stats))
+            shadow(layer, 'accept_task', self._wrap_call(layer.accept_task, stats.accept_task))
+            shadow(layer, 'subtask_completed', self._wrap_call(
+                layer.subtask_completed,
+                stats.subtask_completed
+            ))
+
+    def restore(self):
+        """Removes the timing wrappers."""
+        self._shadowed.restore()
+
+    def get_stats(self, layer):
+        return self._stats[layer]
+
+    def get_all_stats(self):
+        return list(self._stats.values())
+
+    def log_report(self, logger):
+        for stats in self._stats.values():
+            logger.info(str(stats))
+
+    def _wrap_process(self, process, stats):
+        ctx = _CountingContext(stats)
+        record = stats.process.record
+
+        def timed_process(inner_ctx):
+            ctx._inner = inner_ctx
+            start = perf_counter()
+            process(ctx)
+            record(perf_counter() - start)
+        return timed_process
+
+    def _wrap_call(self, method, histogram):
+        record = histogram.record
+
+        def timed_call(task):
+            start = perf_counter()
+            method(task)
+            record(perf_counter() - start)
+        return timed_call
+
+
+class _CountingContext(ForwardingContext):
+    """Counts the tasks a layer emits and completes."""
+
+    def __init__(self, stats):
+        super().__init__()
+        self._stats = stats
+
+    def emit_subtask(self, subtask):
+        self._stats.emitted += 1
+        self._inner.emit_subtask(subtask)
+
+    def complete_task(self, task):
+        self._stats.completed += 1
+        self._inner.complete_task(task)
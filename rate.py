@@ -0,0 +1,169 @@
+from math import inf
+from time import monotonic
+from time import sleep
+
+
+class LoopStats:
+    """Timing statistics collected by a FixedRateRunner.
+
+    Periods are measured between the starts of consecutive ticks. Jitter is the absolute
+    difference between a measured period and the target period.
+    """
+
+    def __init__(self, target_period):
+        self._target_period = target_period
+        self.reset()
+
+    def reset(self):
+        self._ticks = 0
+        self._overruns = 0
+        self._dropped = 0
+        self._periods = 0
+        self._period_sum = 0
+        self._min_period = inf
+        self._max_period = 0
+        self._jitter_sum = 0
+        self._max_jitter = 0
+
+    def get_target_period(self):
+        return self._target_period
+
+    def get_tick_count(self):
+        return self._ticks
+
+    def get_overrun_count(self):
+        """Returns the number of times a tick was still running at the next tick's deadline.
+        Late ticks run to catch up are not counted again."""
+        return self._overruns
+
+    def get_dropped_count(self):
+        """Returns the number of deadlines skipped to recover from overruns."""
+        return self._dropped
+
+    def get_mean_period(self):
+        return self._period_sum / self._periods if self._periods else None
+
+    def get_min_period(self):
+        return self._min_period if self._periods else None
+
+    def get_max_period(self):
+        return self._max_period if self._periods else None
+
+    def get_mean_jitter(self):
+        return self._jitter_sum / self._periods if self._periods else None
+
+    def get_max_jitter(self):
+        return self._max_jitter if self._periods else None
+
+    def record_period(self, period):
+        """Records the time between the starts of two consecutive ticks."""
+        self._periods += 1
+        self._period_sum += period
+        if period < self._min_period:
+            self._min_period = period
+        if period > self._max_period:
+            self._max_period = period
+        if self._target_period:
+            jitter = abs(period - self._target_period)
+            self._jitter_sum += jitter
+            if jitter > self._max_jitter:
+                self._max_jitter = jitter
+
+    def record_tick(self, overrun=False, dropped=0):
+        """Records a finished tick, whether it newly overran the next deadline, and how many
+        deadlines were dropped after it."""
+        self._ticks += 1
+        if overrun:
+            self._overruns += 1
+        self._dropped += dropped
+
+    def __str__(self):
+        if not self._periods:
+            return f'{self._ticks} ticks'
+        return (f'{self._ticks} ticks, period mean {self.get_mean_period() * 1000:.2f} ms '
+            f'min {self._min_period * 1000:.2f} ms max {self._max_period * 1000:.2f} ms, '
+            f'jitter mean {self.get_mean_jitter() * 1000:.2f} ms '
+            f'max {self._max_jitter * 1000:.2f} ms, '
+            f'{self._overruns} overruns, {self._dropped} dropped')
+
+
+class FixedRateRunner:
+    """Calls a function at a fixed rate, sleeping until each tick's deadline.
+
+    When a tick runs past the next deadline, the CATCH_UP policy keeps every deadline and runs the
+    late ticks back to back until the runner is on schedule again, while the DROP policy skips the
+    deadlines that have already passed and waits for the next one that has not.
+    """
+
+    CATCH_UP = 'catch_up'
+    DROP = 'drop'
+
+    def __init__(self, rate, policy=DROP, logger=None, report_interval=None, clock=monotonic,
+            sleep=sleep):
+        """Constructs a FixedRateRunner.
+
+        :param rate: The target tick rate in Hz, or None to run ticks back to back.
+        :param policy: FixedRateRunner.CATCH_UP or FixedRateRunner.DROP.
+        :param logger: A Logger to periodically report statistics to.
+        :param report_interval: The number of seconds between reports to logger.
+        """
+        if rate != None and rate <= 0:
+            raise ValueError('Loop rate must be positive')
+        if policy not in (self.CATCH_UP, self.DROP):
+            raise ValueError(f'Unknown overrun policy {policy}')
+        self._period = 1 / rate if rate else None
+        self._policy = policy
+        self._logger = logger
+        self._report_interval = report_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._stats = LoopStats(self._period)
+        self._deadline = None
+        self._behind = False
+        self._last_start = None
+        self._last_report = None
+
+    def get_stats(self):
+        return self._stats
+
+    def run(self, step, max_ticks=None):
+        """Calls step once per tick, forever or until max_ticks ticks have run."""
+        ticks = 0
+        while max_ticks == None or ticks < max_ticks:
+            self.tick(step)
+            ticks += 1
+
+    def tick(self, step):
+        """Waits for the next deadline, then calls step once."""
+        now = self._clock()
+        if self._deadline == None:
+            self._deadline = now
+            self._last_report = now
+        elif self._period and now < self._deadline:
+            self._sleep(self._deadline - now)
+            now = self._clock()
+        if self._last_start != None:
+            self._stats.record_period(now - self._last_start)
+        self._last_start = now
+
+        step()
+
+        end = self._clock()
+        overrun = False
+        dropped = 0
+        if self._period:
+            self._deadline += self._period
+            if end > self._deadline:
+                overrun = not self._behind
+                if self._policy == self.DROP:
+                    dropped = int((end - self._deadline) // self._period) + 1
+                    self._deadline += dropped * self._period
+                else:
+                    self._behind = True
+            else:
+                self._behind = False
+        self._stats.record_tick(overrun, dropped)
+        if (self._logger and self._report_interval
+                and end - self._last_report >= self._report_interval):
+            self._logger.info(f'Loop timing: {self._stats}')
+            self._last_report = end
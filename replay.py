@@ -0,0 +1,180 @@
+from layer import ForwardingContext
+from layer import Layer
+from profiling import ShadowedMethods
+from profiling import get_layer_labels
+from struct import Struct
+import pickle
+
+
+class TaskRecorder:
+    """Writes every task the layers of a RobotController emit or complete to a binary task log,
+    tagged with the update it happened in.
+
+    The log starts with a pickled header, prefixed with its length packed as HEADER, naming each
+    layer in schedule order and the task types it outputs. Each record after it is a fixed-size
+    header, packed as RECORD, holding the tick, the index of the layer that emitted or completed
+    the task, the kind of record and the length of the pickled task that follows. The edges a task
+    crossed follow from the graph's task routing, so each task is written once however many
+    layers receive it.
+    """
+
+    MAGIC = b'TLOG\x01'
+    HEADER = Struct('!I')
+    RECORD = Struct('!IHBI')
+    EMIT = 0
+    COMPLETE = 1
+
+    def __init__(self, path):
+        self._path = path
+        self._file = None
+        self._shadowed = ShadowedMethods()
+        self._tick = 0
+
+    def instrument(self, layers):
+        header = pickle.dumps(
+            [(label, tuple(layer.get_output_tasks()))
+                for layer, label in zip(layers, get_layer_labels(layers))],
+            pickle.HIGHEST_PROTOCOL
+        )
+        self._file = open(self._path, 'wb')
+        self._file.write(self.MAGIC)
+        self._file.write(self.HEADER.pack(len(header)))
+        self._file.write(header)
+        for index, layer in enumerate(layers):
+            self._shadowed.shadow(layer, 'process', self._wrap_process(layer.process, index))
+
+    def restore(self):
+        """Removes the recording wrappers and closes the log."""
+        self._shadowed.restore()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def next_tick(self):
+        """Advances the tick records are tagged with. RobotController calls this at the start of
+        every update."""
+        self._tick += 1
+
+    def _write(self, index, kind, task):
+        payload = pickle.dumps(task, pickle.HIGHEST_PROTOCOL)
+        self._file.write(self.RECORD.pack(self._tick, index, kind, len(payload)) + payload)
+
+    def _wrap_process(self, process, index):
+        ctx = _RecordingContext(self, index)
+
+        def recorded_process(inner_ctx):
+            ctx._inner = inner_ctx
+            process(ctx)
+        return recorded_process
+
+
+class _RecordingContext(ForwardingContext):
+    """Writes the tasks a layer emits and completes to a TaskRecorder."""
+
+    def __init__(self, recorder, index):
+        super().__init__()
+        self._recorder = recorder
+        self._index = index
+
+    def emit_subtask(self, subtask):
+        self._recorder._write(self._index, TaskRecorder.EMIT, subtask)
+        self._inner.emit_subtask(subtask)
+
+    def complete_task(self, task):
+        self._recorder._write(self._index, TaskRecorder.COMPLETE, task)
+        self._inner.complete_task(task)
+
+
+class TaskLog:
+    """A task log written by TaskRecorder, read back into memory.
+
+    Task logs are unpickled, so only read logs you recorded yourself.
+    """
+
+    def __init__(self, path):
+        record = TaskRecorder.RECORD
+        with open(path, 'rb') as file:
+            data = file.read()
+        if not data.startswith(TaskRecorder.MAGIC):
+            raise ValueError(f'{path} is not a task log')
+        offset = len(TaskRecorder.MAGIC)
+        length, = TaskRecorder.HEADER.unpack_from(data, offset)
+        offset += TaskRecorder.HEADER.size
+        layers = pickle.loads(data[offset:offset + length])
+        offset += length
+        self._labels = [label for label, _ in layers]
+        self._output_tasks = [set(output_tasks) for _, output_tasks in layers]
+        self._records = []
+        while offset < len(data):
+            tick, index, kind, length = record.unpack_from(data, offset)
+            offset += record.size
+            self._records.append((tick, index, kind, pickle.loads(data[offset:offset + length])))
+            offset += length
+
+    def get_labels(self):
+        """Returns the labels of the recorded layers in schedule order."""
+        return list(self._labels)
+
+    def get_records(self):
+        """Returns (tick, layer label, kind, task) tuples in the order they were recorded, where
+        kind is TaskRecorder.EMIT or TaskRecorder.COMPLETE."""
+        return [(tick, self._labels[index], kind, task)
+            for tick, index, kind, task in self._records]
+
+    def get_emitted(self, label):
+        """Returns (tick, task) pairs for every task the layer with the given label emitted."""
+        index = self._index(label)
+        return [(tick, task) for tick, i, kind, task in self._records
+            if i == index and kind == TaskRecorder.EMIT]
+
+    def get_output_tasks(self, label):
+        return set(self._output_tasks[self._index(label)])
+
+    def create_replay_layer(self, label):
+        """Returns a ReplayLayer that emits what the layer with the given label emitted."""
+        return ReplayLayer(self.get_emitted(label), self.get_output_tasks(label))
+
+    def _index(self, label):
+        try:
+            return self._labels.index(label)
+        except ValueError:
+            raise ValueError(f'No layer labelled {label} in task log') from None
+
+
+class ReplayLayer(Layer):
+    """A source layer that emits a recorded stream of (tick, task) pairs, each in the first update
+    at or after its tick in which the layer is processed, and requests a task when processed after
+    the stream has run out.
+
+    Standing in for an input generator, it reproduces a recorded run without hardware or
+    gamepads.
+    """
+
+    def __init__(self, stream, output_tasks):
+        self._stream = stream
+        self._output_tasks = output_tasks
+        self._next = 0
+        self._tick = 0
+
+    def setup(self, setup_info):
+        setup_info.add_update_listener(self._next_tick)
+
+    def get_input_tasks(self):
+        return set()
+
+    def get_output_tasks(self):
+        return self._output_tasks
+
+    def process(self, ctx):
+        stream = self._stream
+        if self._next == len(stream):
+            ctx.request_task()
+        while self._next < len(stream) and stream[self._next][0] <= self._tick:
+            ctx.emit_subtask(stream[self._next][1])
+            self._next += 1
+
+    def accept_task(self, task):
+        raise TypeError
+
+    def _next_tick(self):
+        self._tick += 1
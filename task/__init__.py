@@ -2,11 +2,79 @@ class Task:
     """
     Marker base class for task objects sent between Layers.
     """
-    pass
+    # Set by tracing.LatencyTracer when it is enabled. Subclasses declare __slots__ so emitting a
+    # task every tick doesn't allocate an instance dict.
+    __slots__ = 'origin',
+
+
+class ValueTask(Task):
+    """
+    Base class for tasks that compare by value: two are equal if they have the same type and equal
+    values in every slot their classes declare. Value tasks are hashable, so treat them as
+    immutable.
+    """
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._value_slots = tuple(
+            name
+            for klass in reversed(cls.__mro__)
+            for name in vars(klass).get('__slots__', ())
+            if name != 'origin'
+        )
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self._value_slots)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash((type(self), self._values()))
+
+    def __repr__(self):
+        values = ', '.join(f'{name.lstrip("_")}={getattr(self, name)!r}'
+            for name in self._value_slots)
+        return f'{type(self).__name__}({values})'
 
 
 class WinTask(Task):
     """
     The top-level robot task: to win (duh!).
     """
-    pass
+    __slots__ = ()
+
+
+class TaskPool:
+    """
+    Hands out task objects from a fixed ring so a layer emitting a task every tick can overwrite
+    old ones in place instead of allocating new ones.
+
+    A task is reused after size more acquisitions, so only pool tasks whose receivers are done
+    with each one by then, as mapping layers are once the next task arrives.
+    """
+
+    def __init__(self, factory, size):
+        """
+        Constructs a TaskPool.
+
+        :param factory: a function returning a new task to fill the pool with.
+        :param size: the number of tasks in the ring.
+        """
+        if size < 1:
+            raise ValueError('TaskPool size must be at least 1')
+        self._tasks = [factory() for _ in range(size)]
+        self._next = 0
+
+    def acquire(self):
+        """
+        Returns the least recently acquired task, which the caller must overwrite.
+        """
+        task = self._tasks[self._next]
+        self._next += 1
+        if self._next == len(self._tasks):
+            self._next = 0
+        return task
@@ -1,10 +1,11 @@
-from task import Task
+from task import ValueTask
 
 
-class AxialMovementTask(Task):
+class AxialMovementTask(ValueTask):
     """
     Moves the robot forwards or backwards by a distance.
     """
+    __slots__ = '_distance',
 
     def __init__(self, distance: float):
         """
@@ -25,10 +26,11 @@ class AxialMovementTask(Task):
         return self._distance
 
 
-class TurnTask(Task):
+class TurnTask(ValueTask):
     """
     Turns the robot in place.
     """
+    __slots__ = '_angle',
 
     def __init__(self, angle: float):
         """
@@ -48,10 +50,11 @@ class TurnTask(Task):
         return self._angle
 
 
-class LinearMovementTask(Task):
+class LinearMovementTask(ValueTask):
     """
     Tells a robot supporting holonomic drive to move in a straight line without turning.
     """
+    __slots__ = '_axial', '_lateral'
 
     def __init__(self, axial: float, lateral: float):
         """
@@ -80,11 +83,12 @@ class LinearMovementTask(Task):
         return self._lateral
 
 
-class HolonomicDriveTask(Task):
+class HolonomicDriveTask(ValueTask):
     """
     Specifies relative accelerations for the axial, lateral, and yaw component
     of a holonomic drive (a drive train that can strafe without turning).
     """
+    __slots__ = '_axial', '_lateral', '_yaw'
 
     def __init__(self, axial: float, lateral: float, yaw: float):
         """
@@ -122,11 +126,12 @@ class HolonomicDriveTask(Task):
         return self._yaw
 
 
-class TankDriveTask(Task):
+class TankDriveTask(ValueTask):
     """
     Specifies relative accelerations for left and right side of the robot.
     Despite the name, not necessarily produced by tank drive controls.
     """
+    __slots__ = '_left', '_right'
 
     def __init__(self, left: float, right: float):
         """
@@ -3,6 +3,8 @@ from task import Task
 
 class Joystick:
     """Represents a joystick with x and y axes."""
+    __slots__ = 'x', 'y'
+
     def __init__(self, x: float, y: float):
         self.x = x
         self.y = y
@@ -10,6 +12,8 @@ class Joystick:
 
 class Joysticks:
     """Represents a pair of joysticks."""
+    __slots__ = 'left', 'right'
+
     def __init__(self, left: Joystick, right: Joystick):
         self.left = left
         self.right = right
@@ -17,6 +21,8 @@ class Joysticks:
 
 class ButtonPair:
     """Represents a pair of buttons, such as bumpers or triggers."""
+    __slots__ = 'left', 'right'
+
     def __init__(self, left: bool, right: bool):
         self.left = left
         self.right = right
@@ -24,6 +30,8 @@ class ButtonPair:
 
 class DirectionalPad:
     """Represents the directional pad (D-pad) on a gamepad."""
+    __slots__ = 'up', 'right', 'down', 'left'
+
     def __init__(self, up: bool, right: bool, down: bool, left: bool):
         self.up = up
         self.right = right
@@ -33,6 +41,8 @@ class DirectionalPad:
 
 class Buttons:
     """Represents individual buttons on a gamepad."""
+    __slots__ = 'a', 'b', 'x', 'y'
+
     def __init__(self, a: bool, b: bool, x: bool, y: bool):
         self.a = a
         self.b = b
@@ -40,8 +50,12 @@ class Buttons:
         self.y = y
 
 
-class GamepadInputTask:
-    """Represents the input state of a gamepad."""
+class GamepadInputTask(Task):
+    """Represents the input state of a gamepad.
+
+    A GamepadInputTask from a TaskPool is overwritten in place with set when it is reused.
+    """
+    __slots__ = 'joysticks', 'bumpers', 'triggers', 'dpad', 'buttons'
     TRIGGER_MIN = 0.3  # Threshold for triggers to be considered "pressed"
 
     def __init__(
@@ -72,10 +86,68 @@ class GamepadInputTask:
         self.dpad = DirectionalPad(dpad_up, dpad_right, dpad_down, dpad_left)
         self.buttons = Buttons(button_a, button_b, button_x, button_y)
 
+    @classmethod
+    def create_idle(cls):
+        """Returns a GamepadInputTask with nothing pressed, for a TaskPool to fill in with set."""
+        return cls(0.0, 0.0, False, False, 0.0, 0.0, False, False,
+            False, False, False, False, False, False, False, False)
 
-class KeyboardInputTask:
-    def __init__(self, input_dict):
-        self._input_dict = input_dict
+    def set(
+        self,
+        joystick_left_x: float,
+        joystick_left_y: float,
+        bumper_left: bool,
+        trigger_left: float,
+        joystick_right_x: float,
+        joystick_right_y: float,
+        bumper_right: bool,
+        trigger_right: float,
+        dpad_up: bool,
+        dpad_right: bool,
+        dpad_down: bool,
+        dpad_left: bool,
+        button_a: bool,
+        button_b: bool,
+        button_x: bool,
+        button_y: bool,
+    ):
+        """Overwrites the input state in place, taking the same arguments as the constructor."""
+        joysticks = self.joysticks
+        joysticks.left.x = joystick_left_x
+        joysticks.left.y = joystick_left_y
+        joysticks.right.x = joystick_right_x
+        joysticks.right.y = joystick_right_y
+        self.bumpers.left = bumper_left
+        self.bumpers.right = bumper_right
+        self.triggers.left = (trigger_left if isinstance(trigger_left, bool)
+            else trigger_left >= self.TRIGGER_MIN)
+        self.triggers.right = (trigger_right if isinstance(trigger_right, bool)
+            else trigger_right >= self.TRIGGER_MIN)
+        dpad = self.dpad
+        dpad.up = dpad_up
+        dpad.right = dpad_right
+        dpad.down = dpad_down
+        dpad.left = dpad_left
+        buttons = self.buttons
+        buttons.a = button_a
+        buttons.b = button_b
+        buttons.x = button_x
+        buttons.y = button_y
+
+
+class KeyboardInputTask(Task):
+    """Represents the state of the keys in KEYS, stored as a tuple in the same order."""
+    __slots__ = '_values',
+    KEYS = tuple("abcdefghijklmnopqrstuvwxyz0123456789,./;'[]") + (
+        'left_arrow',
+        'right_arrow',
+        'up_arrow',
+        'down_arrow'
+    )
+    _INDEX = {key: i for i, key in enumerate(KEYS)}
+
+    def __init__(self, values):
+        self._values = values
 
     def get(self, key):
-        return self._input_dict[key]
+        return self._values[self._INDEX[key]]
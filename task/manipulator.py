@@ -1,10 +1,11 @@
-from task import Task
+from task import ValueTask
 
 
-class LiftTask(Task):
+class LiftTask(ValueTask):
     """
     Extends or retracts the lift.
     """
+    __slots__ = '_swing', '_full_extend', '_full_retract', '_raise_lift', '_lower_lift'
 
     def __init__(self, swing: float, full_extend: bool, full_retract: bool, raise_lift: bool, lower_lift: bool):
         """
@@ -28,10 +29,11 @@ class LiftTask(Task):
         self._lower_lift = lower_lift
 
 
-class LiftTeleopTask(Task):
+class LiftTeleopTask(ValueTask):
     """
     Extends, retracts, or swings a lift using absolute powers.
     """
+    __slots__ = '_swing', '_extension'
 
     def __init__(self, swing: float, extension: float):
         """
@@ -45,11 +47,12 @@ class LiftTeleopTask(Task):
         self._extension = extension
 
 
-class TowerForearmTask(Task):
+class TowerForearmTask(ValueTask):
     """
     Unfolds the tower's forearm.
     Should be issued before any other tower tasks to initialize the tower.
     """
+    __slots__ = ()
 
     def __init__(self):
         """
@@ -58,10 +61,11 @@ class TowerForearmTask(Task):
         pass
 
 
-class TowerTask(Task):
+class TowerTask(ValueTask):
     """
     Raises or lowers the arm in an arc.
     """
+    __slots__ = '_full_raise', '_full_lower'
 
     def __init__(self, full_raise: bool, full_lower: bool):
         """
@@ -93,10 +97,11 @@ class TowerTask(Task):
         return self._full_lower
 
 
-class TowerTeleopTask(Task):
+class TowerTeleopTask(ValueTask):
     """
     Controls the tower in teleop.
     """
+    __slots__ = '_tower_swing_power', '_forearm_swing_power'
 
     def __init__(self, tower_swing_power: float, forearm_swing_power: float):
         """
@@ -127,7 +132,9 @@ class TowerTeleopTask(Task):
         return self._forearm_swing_power
 
 
-class DriveBeltTask(Task):
+class DriveBeltTask(ValueTask):
+    __slots__ = '_power',
+
     def __init__(self, forward_power: float):
         self._power = forward_power
 
@@ -135,7 +142,9 @@ class DriveBeltTask(Task):
         return self._power
 
 
-class DriveWheelBeltTask(Task):
+class DriveWheelBeltTask(ValueTask):
+    __slots__ = '_power',
+
     def __init__(self, ccw_power: float):
         self._power = ccw_power
 
@@ -143,7 +152,9 @@ class DriveWheelBeltTask(Task):
         return self._power
 
 
-class DriveButtonPusherTask(Task):
+class DriveButtonPusherTask(ValueTask):
+    __slots__ = '_should_change', '_is_high'
+
     def __init__(self, should_change: bool, is_high: bool):
         self._should_change = should_change
         self._is_high = is_high
@@ -1,10 +1,17 @@
 from controller import LayerGraph
 from controller import RobotController
+from devices import Motor
+from layer import AbstractFunctionLayer
 from layer import Layer
+from layer import LayerProcessContext
 from log import LoggerProvider
 from log import StdioBackend
 from task import Task
+from tracing import TraceBuffer
+from random import Random
+from time import monotonic
 from unittest import TestCase
+import tracemalloc
 
 
 class TestLayerGraph(TestCase):
@@ -34,6 +41,41 @@ class TestLayerGraph(TestCase):
         with self.assertRaisesRegex(ValueError, 'Cycle'):
             self._g.add_connection(b, a)
 
+    def test_connection_cyclic_unchanged(self):
+        a = TestLayer()
+        b = TestLayer()
+        c = TestLayer()
+        self._g.add_chain([a, b, c])
+        with self.assertRaisesRegex(ValueError, 'Cycle'):
+            self._g.add_connection(c, a)
+        self.assertEqual(self._g.get_children(c), set())
+        self.assertEqual(self._g.get_sources(), {a})
+        self.assertEqual(self._g.get_sinks(), {c})
+
+    def test_connection_cyclic_random(self):
+        rng = Random(2025)
+        layers = [TestLayer() for _ in range(30)]
+        edges = set()
+        for _ in range(300):
+            a, b = rng.sample(layers, 2)
+            # Adding a -> b closes a cycle exactly when a is reachable from b.
+            reachable = {b}
+            stack = [b]
+            while stack:
+                v = stack.pop()
+                for x, y in edges:
+                    if x is v and y not in reachable:
+                        reachable.add(y)
+                        stack.append(y)
+            if a in reachable:
+                with self.assertRaisesRegex(ValueError, 'Cycle'):
+                    self._g.add_connection(a, b)
+            else:
+                self._g.add_connection(a, b)
+                edges.add((a, b))
+        order = self._g._order
+        self.assertTrue(all(order[a] < order[b] for a, b in edges))
+
     def test_add_connections(self):
         self._g.add_connections([
             (OutputOnlyLayer(), InputOnlyLayer()),
@@ -81,9 +123,291 @@ class TestLayerGraphRelations(TestCase):
     def test_get_sources(self):
         self.assertEqual(self._g.get_sources(), {self._a})
 
-    def test_get_parents(self):
+    def test_get_sinks(self):
         self.assertEqual(self._g.get_sinks(), {self._b})
 
+    def test_views_follow_connections(self):
+        c = InputOnlyLayer()
+        verts = self._g.get_verts()
+        sinks = self._g.get_sinks()
+        self._g.add_connection(self._a, c)
+        self.assertEqual(verts, {self._a, self._b, c})
+        self.assertEqual(sinks, {self._b, c})
+
+
+class TestLayerGraphRouting(TestCase):
+    def setUp(self):
+        self._g = LayerGraph()
+        self._emitter = EmitterLayer([DriveTask(), PeripheralTask()])
+        self._drive = CollectLayer(input_tasks={DriveTask})
+        self._peripheral = CollectLayer(input_tasks={PeripheralTask})
+        self._snooper = CollectLayer()
+        self._g.add_connections([
+            (self._emitter, self._drive),
+            (self._emitter, self._peripheral),
+            (self._emitter, self._snooper),
+        ])
+        self._g.freeze()
+
+    def test_task_children(self):
+        self.assertEqual(
+            set(self._g.get_task_children(self._emitter, DriveTask)),
+            {self._drive, self._snooper}
+        )
+
+    def test_task_children_subclass(self):
+        self.assertEqual(
+            set(self._g.get_task_children(self._emitter, TankTask)),
+            {self._drive, self._snooper}
+        )
+
+    def test_task_parents(self):
+        self.assertEqual(self._g.get_task_parents(self._drive, DriveTask), (self._emitter,))
+        self.assertEqual(self._g.get_task_parents(self._drive, VisionTask), ())
+
+    def test_frozen(self):
+        with self.assertRaisesRegex(RuntimeError, 'frozen'):
+            self._g.add_connection(OutputOnlyLayer(), InputOnlyLayer())
+
+
+class TestLayerGraphSchedule(TestCase):
+    def setUp(self):
+        self._g = LayerGraph()
+        self._top = TestLayer()
+        self._left = TestLayer()
+        self._right = TestLayer()
+        self._bottom = TestLayer()
+        self._g.add_connections([
+            (self._top, self._left),
+            (self._top, self._right),
+            (self._left, self._bottom),
+            (self._right, self._bottom),
+        ])
+        self._g.freeze()
+
+    def test_schedule_order(self):
+        self.assertEqual(
+            self._g.get_schedule(),
+            (self._bottom, self._left, self._right, self._top)
+        )
+
+
+class TestRobotControllerSchedule(TestCase):
+    def test_process_once_after_children(self):
+        log = []
+        top = RecordLayer(log, 'top')
+        left = RecordLayer(log, 'left')
+        right = RecordLayer(log, 'right')
+        bottom = RecordLayer(log, 'bottom')
+        lg = LayerGraph().add_connections([
+            (top, left),
+            (top, right),
+            (left, bottom),
+            (right, bottom),
+        ])
+        rc = RobotController()
+        rc.setup(None, None, lg, LoggerProvider())
+        rc.update()
+        self.assertEqual(log, ['bottom', 'left', 'right', 'top'])
+
+
+class TestRobotControllerEventDriven(TestCase):
+    def _run(self, sink, updates, event_driven=True):
+        lg = LayerGraph().add_connection(HoldLayer(DriveTask()), sink)
+        rc = RobotController().event_driven(event_driven)
+        rc.setup(None, None, lg, LoggerProvider())
+        for _ in range(updates):
+            self.assertFalse(rc.update())
+
+    def test_idle_skipped(self):
+        sink = EventLayer()
+        self._run(sink, 10)
+        # Once at startup and once after accepting the task.
+        self.assertEqual(sink.processed, 2)
+
+    def test_disabled(self):
+        sink = EventLayer()
+        self._run(sink, 10, event_driven=False)
+        self.assertEqual(sink.processed, 10)
+
+    def test_wakeup(self):
+        sink = EventLayer(wakeup_delay=0)
+        self._run(sink, 10)
+        self.assertEqual(sink.processed, 10)
+
+
+class TestRobotControllerMultiRate(TestCase):
+    def _run(self, sink, updates):
+        lg = LayerGraph().add_connection(HoldLayer(DriveTask()), sink)
+        rc = RobotController()
+        rc.setup(None, None, lg, LoggerProvider())
+        for _ in range(updates):
+            self.assertFalse(rc.update())
+
+    def test_divisor(self):
+        sink = RateLayer(divisor=3)
+        self._run(sink, 9)
+        self.assertEqual(sink.processed, 3)
+
+    def test_period(self):
+        sink = RateLayer(period=1000)
+        self._run(sink, 10)
+        self.assertEqual(sink.processed, 1)
+
+    def test_every_update(self):
+        sink = RateLayer()
+        self._run(sink, 10)
+        self.assertEqual(sink.processed, 10)
+        self.assertEqual(sink.times, sorted(sink.times))
+
+    def test_time_without_controller(self):
+        start = monotonic()
+        ctx = LayerProcessContext(None, None, None)
+        self.assertGreaterEqual(ctx.get_time(), start)
+
+
+class TestRobotControllerInstrumentation(TestCase):
+    def test_stats(self):
+        emitter = EmitterLayer([WinTask()])
+        flat_map = FlatMapLayer({
+            WinTask: [GameActionTask(), GameActionTask()],
+        })
+        collector = CollectLayer()
+        lg = LayerGraph().add_chain([emitter, flat_map, collector])
+        rc = RobotController().instrument(True)
+        rc.setup(None, None, lg, LoggerProvider())
+        while not rc.update():
+            pass
+        profiler = rc.get_profiler()
+        self.assertEqual(profiler.get_stats(flat_map).emitted, 2)
+        self.assertEqual(profiler.get_stats(flat_map).completed, 1)
+        self.assertEqual(profiler.get_stats(collector).accept_task.get_count(), 2)
+        self.assertEqual(profiler.get_stats(emitter).subtask_completed.get_count(), 1)
+        self.assertGreater(profiler.get_stats(collector).process.get_count(), 0)
+        self.assertIsNotNone(profiler.get_stats(collector).process.percentile(0.99))
+        # Wrappers are removed once the layers finish.
+        self.assertNotIn('process', vars(collector))
+
+    def test_disabled(self):
+        collector = CollectLayer()
+        lg = LayerGraph().add_chain([EmitterLayer([WinTask()]), collector])
+        rc = RobotController()
+        rc.setup(None, None, lg, LoggerProvider())
+        self.assertIsNone(rc.get_profiler())
+        self.assertNotIn('process', vars(collector))
+
+
+class TestRobotControllerParallel(TestCase):
+    def _run(self, workers):
+        tasks = [PeripheralTask(), DriveTask(), PeripheralTask(), DriveTask()]
+        peripheral_layer = CollectLayer(input_tasks={PeripheralTask})
+        drive_map = FlatMapLayer({DriveTask: [TankTask(), TankTask()]})
+        drive_layer = CollectLayer(input_tasks={DriveTask})
+        emitter = EmitterLayer(tasks)
+        lg = LayerGraph().add_connections([
+            (emitter, peripheral_layer),
+            (emitter, drive_map),
+            (drive_map, drive_layer),
+        ])
+        rc = RobotController().parallel(workers)
+        rc.setup(None, None, lg, LoggerProvider())
+        for updates in range(1, 100):
+            if rc.update():
+                break
+        else:
+            self.fail('Program did not complete in 100 updates.')
+        return updates, peripheral_layer.collect(), drive_layer.collect()
+
+    def test_matches_serial(self):
+        serial_updates, _, _ = self._run(None)
+        updates, peripheral_tasks, drive_tasks = self._run(2)
+        self.assertEqual(updates, serial_updates)
+        self.assertEqual([type(t) for t in peripheral_tasks], [PeripheralTask] * 2)
+        self.assertEqual([type(t) for t in drive_tasks], [TankTask] * 4)
+
+    def test_batched_mixed_parents(self):
+        def run(workers):
+            # The mapping has a source parent and a parent in its own branch.
+            mapping = CountingMapping()
+            flat_map = FlatMapLayer({WinTask: [WinTask()]})
+            emitter = EmitterLayer([WinTask(), GameActionTask(), WinTask()])
+            lg = LayerGraph().add_connections([
+                (HoldLayer(WinTask()), flat_map),
+                (flat_map, mapping),
+                (emitter, mapping),
+                (mapping, CollectLayer()),
+                (emitter, CollectLayer()),
+            ])
+            rc = RobotController().parallel(workers)
+            rc.setup(None, None, lg, LoggerProvider())
+            for _ in range(6):
+                rc.update()
+            return [type(t) for t in mapping.mapped]
+
+        self.assertEqual(run(2), run(None))
+
+    def test_refuses_shared_state(self):
+        lg = LayerGraph().add_connections([
+            (EmitterLayer([PeripheralTask(), DriveTask()]), CollectLayer({PeripheralTask})),
+            (EmitterLayer([DriveTask()]), CollectLayer({DriveTask})),
+        ])
+        rc = RobotController().parallel(2).trace(TraceBuffer(16))
+        with self.assertRaises(ValueError):
+            rc.setup(None, None, lg, LoggerProvider())
+
+
+class TestRobotControllerBatched(TestCase):
+    def _run(self, compiled):
+        batch_layer = BatchLayer()
+        lg = LayerGraph().add_connections([
+            (HoldLayer(DriveTask()), batch_layer),
+            (HoldLayer(TankTask()), batch_layer),
+        ])
+        rc = RobotController().compiled(compiled)
+        rc.setup(None, None, lg, LoggerProvider())
+        for _ in range(3):
+            rc.update()
+        return batch_layer.batches
+
+    def test_one_call_per_update(self):
+        for compiled in (False, True):
+            batches = self._run(compiled)
+            self.assertEqual(len(batches), 1)
+            self.assertEqual(sorted(type(t).__name__ for t in batches[0]), ['DriveTask', 'TankTask'])
+
+    def test_function_layer_latest_per_type(self):
+        mapping = CountingMapping()
+        collector = CollectLayer()
+        emitted = [WinTask(), GameActionTask(), WinTask()]
+        lg = LayerGraph().add_chain([ConcurrentEmitterLayer([list(emitted)]), mapping, collector])
+        rc = RobotController()
+        rc.setup(None, None, lg, LoggerProvider())
+        for _ in range(3):
+            rc.update()
+        self.assertEqual(mapping.mapped, emitted[1:])
+        self.assertEqual(len(collector.collect()), 1)
+
+
+class TestRobotControllerAllocation(TestCase):
+    def test_steady_state(self):
+        layers = [HoldLayer(Task())] + [RelayLayer() for _ in range(50)]
+        rc = RobotController()
+        rc.setup(None, None, LayerGraph().add_chain(layers), LoggerProvider())
+        for _ in range(len(layers)):
+            rc.update()
+        tracemalloc.start()
+        try:
+            rc.update()
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            for _ in range(10):
+                rc.update()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # Less than the context, buffers and closures processing a single layer used to allocate.
+        self.assertLess(peak - start, 512)
+
 
 class TestRobotController(TestCase):
     def setUp(self):
@@ -170,6 +494,45 @@ class TestRobotController(TestCase):
         self._check_collector_unordered(snooper_layer, [PeripheralTask, DriveTask] * 2)
 
 
+class TestRobotControllerCompiled(TestRobotController):
+    """Runs every TestRobotController case again with a compiled update."""
+    def _create_rc(self):
+        self._rc = RobotController().compiled(True)
+        self._rc.setup(None, None, self._lg, LoggerProvider())
+        self.assertIsNotNone(self._rc._tick)
+
+    def test_matches_interpreted(self):
+        logs = []
+        for compiled in (False, True):
+            log = []
+            top = RecordLayer(log, 'top')
+            left = RecordLayer(log, 'left')
+            right = RecordLayer(log, 'right')
+            lg = LayerGraph().add_connections([
+                (top, left),
+                (top, right),
+                (left, RecordLayer(log, 'bottom')),
+                (right, RecordLayer(log, 'right bottom')),
+            ])
+            rc = RobotController().compiled(compiled)
+            rc.setup(None, None, lg, LoggerProvider())
+            finished = [rc.update() for _ in range(3)]
+            logs.append((log, finished))
+        self.assertEqual(logs[0], logs[1])
+
+    def test_empty(self):
+        rc = RobotController().compiled(True)
+        rc.setup(None, None, LayerGraph(), LoggerProvider())
+        self.assertIsNotNone(rc._tick)
+        self.assertTrue(rc.update())
+
+    def test_gated_interpreted(self):
+        lg = LayerGraph().add_connection(HoldLayer(DriveTask()), RateLayer(divisor=2))
+        rc = RobotController().compiled(True)
+        rc.setup(None, None, lg, LoggerProvider())
+        self.assertIsNone(rc._tick)
+
+
 class TestLayer(Layer):
     def get_input_tasks(self):
         return {Task}
@@ -197,6 +560,124 @@ class InputOnlyLayer(TestLayer):
         return set()
 
 
+class RecordLayer(TestLayer):
+    def __init__(self, log, name):
+        self._log = log
+        self._name = name
+
+    def process(self, ctx):
+        self._log.append(self._name)
+        ctx.request_task()
+
+
+class EventLayer(TestLayer):
+    def __init__(self, wakeup_delay=None):
+        self.processed = 0
+        self._task = None
+        self._wakeup_delay = wakeup_delay
+
+    def get_output_tasks(self):
+        return set()
+
+    def is_event_driven(self):
+        return True
+
+    def process(self, ctx):
+        self.processed += 1
+        if self._task:
+            ctx.complete_task(self._task)
+            self._task = None
+        if self._wakeup_delay != None:
+            ctx.request_wakeup(self._wakeup_delay)
+        ctx.request_task()
+
+    def accept_task(self, task):
+        self._task = task
+
+
+class RateLayer(EventLayer):
+    def __init__(self, period=None, divisor=1):
+        super().__init__()
+        self._period = period
+        self._divisor = divisor
+        self.times = []
+
+    def is_event_driven(self):
+        return False
+
+    def get_period(self):
+        return self._period
+
+    def get_tick_divisor(self):
+        return self._divisor
+
+    def process(self, ctx):
+        self.times.append(ctx.get_time())
+        super().process(ctx)
+
+
+class HoldLayer(TestLayer):
+    """Emits a single task and then never requests one, so the graph never finishes."""
+    def __init__(self, task):
+        self._task = task
+
+    def get_input_tasks(self):
+        return set()
+
+    def get_output_tasks(self):
+        return {type(self._task)}
+
+    def process(self, ctx):
+        if self._task:
+            ctx.emit_subtask(self._task)
+            self._task = None
+
+
+class RelayLayer(TestLayer):
+    """Passes the same task on and completes it on every process call."""
+    def __init__(self):
+        self._task = None
+
+    def process(self, ctx):
+        if self._task:
+            ctx.emit_subtask(self._task)
+            ctx.complete_task(self._task)
+        ctx.request_task()
+
+    def accept_task(self, task):
+        self._task = task
+
+
+class BatchLayer(TestLayer):
+    def __init__(self):
+        self.batches = []
+
+    def process(self, ctx):
+        ctx.request_task()
+
+    def accept_task(self, task):
+        raise AssertionError('accept_task called instead of accept_tasks')
+
+    def accept_tasks(self, batch):
+        self.batches.append(list(batch))
+
+
+class CountingMapping(AbstractFunctionLayer):
+    def __init__(self):
+        super().__init__()
+        self.mapped = []
+
+    def get_input_tasks(self):
+        return {WinTask, GameActionTask}
+
+    def get_output_tasks(self):
+        return {Task}
+
+    def map(self, task):
+        self.mapped.append(task)
+        return task
+
+
 class CollectLayer(Layer):
     def __init__(self, input_tasks=None):
         self._tasks = []
@@ -226,6 +707,71 @@ class CollectLayer(Layer):
         return self._tasks
 
 
+class TimedCollectLayer(CollectLayer):
+    """Collects tasks like CollectLayer, also recording the update each one arrived in."""
+
+    def setup(self, setup_info):
+        super().setup(setup_info)
+        self.ticks = []
+        self._tick = 0
+        setup_info.add_update_listener(self._next_tick)
+
+    def accept_task(self, task):
+        super().accept_task(task)
+        self.ticks.append(self._tick)
+
+    def _next_tick(self):
+        self._tick += 1
+
+
+class StickLayer(Layer):
+    """Emits each of tasks in turn, one on every interval-th process call, like an input generator
+    reading a stick, then requests a task."""
+
+    def __init__(self, tasks, interval=1):
+        self._tasks = list(tasks)
+        self._task_types = {type(t) for t in self._tasks}
+        self._interval = interval
+        self._next = 0
+        self._calls = 0
+
+    def get_input_tasks(self):
+        return set()
+
+    def get_output_tasks(self):
+        return self._task_types
+
+    def process(self, ctx):
+        self._calls += 1
+        if self._next == len(self._tasks):
+            ctx.request_task()
+        elif not self._calls % self._interval:
+            ctx.emit_subtask(self._tasks[self._next])
+            self._next += 1
+
+    def accept_task(self, task):
+        raise TypeError
+
+
+class MotorLayer(CollectLayer):
+    """Collects tasks like CollectLayer, and for every task it accepts sets the velocity of each
+    named Motor to 1 and then 0.5."""
+
+    def __init__(self, names, input_tasks=None):
+        super().__init__(input_tasks)
+        self._names = names
+
+    def setup(self, setup_info):
+        super().setup(setup_info)
+        self._motors = [setup_info.get_device(Motor, name) for name in self._names]
+
+    def accept_task(self, task):
+        super().accept_task(task)
+        for motor in self._motors:
+            motor.set_velocity(1.0)
+            motor.set_velocity(0.5)
+
+
 class FlatMapLayer(Layer):
     def __init__(self, mapping):
         self._mapping = mapping
@@ -302,6 +848,7 @@ class ConcurrentEmitterLayer(Layer):
         self._groups = iter(groups)
         self._task_types = {type(t) for g in groups for t in g}
         self._task = None
+        self._pending = None
         self._should_emit = True
 
     def get_input_tasks(self):
@@ -348,5 +895,8 @@ class RouteTask(Task):
 class DriveTask(Task):
     pass
 
+class TankTask(DriveTask):
+    pass
+
 class PeripheralTask(Task):
     pass
@@ -0,0 +1,293 @@
+from controller import LayerGraph
+from controller import RobotController
+from devices import DistanceSensor
+from devices import DistanceSensorConf
+from devices import Motor
+from devices import MotorConf
+from devices import PidMotor
+from devices import Servo
+from devices import ServoConf
+from devices import ReadCache
+from devices import WriteBatch
+from devices import WriteCache
+from layer import Layer
+from log import LoggerProvider
+from task import WinTask
+from tests.controller import CollectLayer
+from tests.controller import EmitterLayer
+from tests.controller import MotorLayer
+from unittest import TestCase
+import math
+
+
+class WriteLogRobot:
+    def __init__(self):
+        self.writes = []
+        self.reads = 0
+
+    def get_value(self, device_id, key):
+        self.reads += 1
+        return self.reads
+
+    def set_value(self, device_id, key, value):
+        self.writes.append((device_id, key, value))
+
+
+class TestMotor(TestCase):
+    def test_invert(self):
+        robot = WriteLogRobot()
+        motor = Motor()
+        motor.load_conf(robot, MotorConf('kb', 'a', True, False, 1),
+            LoggerProvider().get_logger('test'))
+        motor.set_velocity(0.5)
+        self.assertEqual(robot.writes[-1], ('kb', 'velocity_a', -0.5))
+        self.assertEqual(motor.get_encoder(), -1)
+        motor.set_encoder_invert(True)
+        self.assertEqual(motor.get_encoder(), 2)
+        motor.set_invert(False)
+        motor.set_velocity(0.5)
+        self.assertEqual(robot.writes[-1], ('kb', 'velocity_a', 0.5))
+        self.assertEqual(motor.get_encoder(fresh=True), -3)
+
+
+class MotorPlant:
+    """Simulates a KoalaBear motor whose encoder moves at velocity times ticks_per_sec, with a
+    first-order lag on the velocity, advanced by step."""
+
+    def __init__(self, ticks_per_sec=2000, lag=0.05):
+        self.values = {'velocity_a': 0.0, 'enc_a': 0.0}
+        self._ticks_per_sec = ticks_per_sec
+        self._lag = lag
+        self._speed = 0.0
+
+    def get_value(self, device_id, key):
+        return self.values[key]
+
+    def set_value(self, device_id, key, value):
+        self.values[key] = value
+
+    def step(self, dt):
+        self._speed += (self.values['velocity_a'] - self._speed) * min(1, dt / self._lag)
+        self.values['enc_a'] += self._speed * self._ticks_per_sec * dt
+
+
+class TestPidMotor(TestCase):
+    def _motor(self, plant, pid=(0.01, 0.002, 0.0005)):
+        motor = PidMotor()
+        motor.load_conf(plant, MotorConf('kb', 'a', False, False, 1, pid=pid),
+            LoggerProvider().get_logger('test'))
+        return motor
+
+    def test_disables_hardware_pid(self):
+        plant = MotorPlant()
+        self._motor(plant)
+        self.assertIs(plant.values['pid_enabled_a'], False)
+
+    def test_holds_position(self):
+        plant = MotorPlant()
+        motor = self._motor(plant).set_position(500)
+        now = 0.0
+        for _ in range(400):
+            motor.hold_position(now)
+            plant.step(0.01)
+            now += 0.01
+        self.assertAlmostEqual(motor.get_encoder(), 500, delta=5)
+        self.assertLess(abs(plant.values['velocity_a']), 0.05)
+
+    def test_rejects_disturbance(self):
+        plant = MotorPlant()
+        motor = self._motor(plant).set_position(0)
+        now = 0.0
+        for _ in range(600):
+            motor.hold_position(now)
+            # A constant load pushes the motor backwards; only the integral term can cancel it.
+            plant.values['velocity_a'] -= 0.05
+            plant.step(0.01)
+            now += 0.01
+        self.assertAlmostEqual(motor.get_encoder(), 0, delta=10)
+
+    def test_windowed_integral(self):
+        plant = MotorPlant()
+        motor = self._motor(plant).set_window(8, 3).set_position(100)
+        samples = []
+        for step in range(30):
+            now = step * 0.01
+            plant.values['enc_a'] = step * 3.0
+            motor.hold_position(now)
+            samples.append((now, 100 - step * 3.0))
+        window = samples[-9:]
+        expected = math.fsum((a[1] + b[1]) / 2 * (b[0] - a[0]) for a, b in zip(window, window[1:]))
+        self.assertAlmostEqual(motor.get_integral(), expected)
+
+    def test_requires_coefficients(self):
+        motor = self._motor(MotorPlant(), pid=None).set_position(0)
+        with self.assertRaises(RuntimeError):
+            motor.hold_position(0)
+
+    def test_window(self):
+        with self.assertRaises(ValueError):
+            self._motor(MotorPlant()).set_window(4, 4)
+
+
+class TestWriteCache(TestCase):
+    def setUp(self):
+        self.robot = WriteLogRobot()
+        self.logger = LoggerProvider().get_logger('test')
+
+    def _motor(self, cache):
+        motor = Motor()
+        motor.load_conf(cache.wrap_robot(self.robot), MotorConf('kb', 'a', False, False, 1),
+            self.logger)
+        self.robot.writes.clear()
+        return motor
+
+    def test_skips_unchanged(self):
+        cache = WriteCache()
+        motor = self._motor(cache)
+        for _ in range(5):
+            motor.set_velocity(0.5)
+        motor.set_velocity(0.25)
+        self.assertEqual(self.robot.writes, [('kb', 'velocity_a', 0.5), ('kb', 'velocity_a', 0.25)])
+        self.assertEqual(cache.get_saved_count(), 4)
+
+    def test_epsilon(self):
+        cache = WriteCache(epsilon=0.01)
+        motor = self._motor(cache)
+        motor.set_velocity(0.5)
+        motor.set_velocity(0.505)
+        motor.set_velocity(0.509)
+        motor.set_velocity(0.511)
+        self.assertEqual([v for _, _, v in self.robot.writes], [0.5, 0.511])
+
+    def test_resync(self):
+        cache = WriteCache()
+        servo = Servo()
+        servo.load_conf(cache.wrap_robot(self.robot), ServoConf('sc', '1'), self.logger)
+        servo.set_position(1)
+        cache.resync('sc')
+        servo.set_position(1)
+        cache.resync()
+        servo.set_position(1)
+        self.assertEqual(len(self.robot.writes), 3)
+        self.assertEqual(cache.get_saved_count(), 0)
+
+    def test_volatile(self):
+        cache = WriteCache()
+        motor = self._motor(cache)
+        motor.reset_encoder()
+        motor.reset_encoder()
+        self.assertEqual(len(self.robot.writes), 2)
+
+    def test_type_change(self):
+        cache = WriteCache()
+        robot = cache.wrap_robot(self.robot)
+        robot.set_value('kb', 'deadband_a', 0)
+        robot.set_value('kb', 'deadband_a', 0.0)
+        robot.set_value('kb', 'pid_enabled_a', False)
+        robot.set_value('kb', 'pid_enabled_a', False)
+        self.assertEqual(cache.get_write_count(), 3)
+
+
+class SensorLayer(Layer):
+    """Reads the distance sensor twice every update for a few updates."""
+
+    def __init__(self, updates):
+        self._updates = updates
+        self.distances = []
+
+    def setup(self, setup_info):
+        self._sensor = setup_info.get_device(DistanceSensor, 'sensor')
+
+    def get_input_tasks(self):
+        return set()
+
+    def get_output_tasks(self):
+        return {WinTask}
+
+    def process(self, ctx):
+        if not self._updates:
+            ctx.request_task()
+            return
+        self._updates -= 1
+        self.distances.append((self._sensor.get_distance(), self._sensor.get_distance()))
+
+    def accept_task(self, task):
+        raise TypeError
+
+
+class TestReadCache(TestCase):
+    def setUp(self):
+        self.robot = WriteLogRobot()
+        self.logger = LoggerProvider().get_logger('test')
+
+    def test_snapshot(self):
+        cache = ReadCache()
+        robot = cache.wrap_robot(self.robot)
+        self.assertEqual(robot.get_value('kb', 'enc_a'), 1)
+        self.assertEqual(robot.get_value('kb', 'enc_a'), 1)
+        self.assertEqual(robot.get_value('kb', 'enc_b'), 2)
+        cache.invalidate()
+        self.assertEqual(robot.get_value('kb', 'enc_a'), 3)
+        self.assertEqual((cache.get_read_count(), cache.get_hit_count()), (3, 1))
+
+    def test_fresh(self):
+        cache = ReadCache()
+        motor = Motor()
+        motor.load_conf(cache.wrap_robot(self.robot), MotorConf('kb', 'a', False, False, 1),
+            self.logger)
+        self.assertEqual(motor.get_encoder(), 1)
+        self.assertEqual(motor.get_encoder(fresh=True), 2)
+        self.assertEqual(motor.get_encoder(), 2)
+
+    def test_write_drops_snapshot(self):
+        cache = ReadCache()
+        robot = cache.wrap_robot(self.robot)
+        robot.get_value('kb', 'velocity_a')
+        robot.set_value('kb', 'velocity_a', 0.5)
+        robot.get_value('kb', 'velocity_a')
+        self.assertEqual(self.robot.reads, 2)
+
+    def test_controller_invalidates(self):
+        layer = SensorLayer(3)
+        conf = {'sensor': DistanceSensorConf('ds', 0)}
+        rc = RobotController().cache_reads(ReadCache())
+        rc.setup(self.robot, conf, LayerGraph().add_chain([layer, CollectLayer()]), LoggerProvider())
+        while not rc.update():
+            pass
+        self.assertEqual(layer.distances, [(1, 1), (2, 2), (3, 3)])
+
+
+class TestWriteBatch(TestCase):
+    def setUp(self):
+        self.robot = WriteLogRobot()
+
+    def test_flush(self):
+        batch = WriteBatch()
+        robot = batch.wrap_robot(self.robot)
+        robot.set_value('kb', 'velocity_b', 1.0)
+        robot.set_value('kb', 'velocity_a', 1.0)
+        robot.set_value('kb', 'velocity_b', 0.5)
+        self.assertEqual(robot.get_value('kb', 'velocity_b'), 0.5)
+        self.assertEqual(self.robot.writes, [])
+        batch.flush()
+        self.assertEqual(self.robot.writes,
+            [('kb', 'velocity_b', 0.5), ('kb', 'velocity_a', 1.0)])
+        batch.flush()
+        self.assertEqual((batch.get_stage_count(), batch.get_write_count()), (3, 2))
+
+    def test_controller_flushes(self):
+        conf = {
+            'left': MotorConf('kb', 'a', False, False, 1),
+            'right': MotorConf('kb', 'b', False, False, 1),
+        }
+        source = EmitterLayer([WinTask()])
+        lg = LayerGraph().add_connection(source, MotorLayer(['left', 'right']))
+        rc = RobotController().batch_writes(WriteBatch())
+        rc.setup(self.robot, conf, lg, LoggerProvider())
+        setup_writes = len(self.robot.writes)
+        while not rc.update():
+            pass
+        self.assertEqual(
+            sorted(self.robot.writes[setup_writes:]),
+            [('kb', 'velocity_a', 0.5), ('kb', 'velocity_b', 0.5)]
+        )
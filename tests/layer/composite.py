@@ -0,0 +1,79 @@
+from controller import LayerGraph
+from controller import RobotController
+from layer import AbstractQueuedLayer
+from layer import ParallelLayer
+from layer import SequenceLayer
+from log import LoggerProvider
+from tests.controller import DriveTask
+from tests.controller import EmitterLayer
+from tests.controller import PeripheralTask
+from tests.controller import TimedCollectLayer
+from tests.controller import WinTask
+from unittest import TestCase
+
+
+class StepsLayer(AbstractQueuedLayer):
+    """Emits count tasks of the given type one at a time for each task it accepts."""
+
+    def __init__(self, task_type, count):
+        super().__init__()
+        self._task_type = task_type
+        self._count = count
+
+    def get_input_tasks(self):
+        return {WinTask}
+
+    def get_output_tasks(self):
+        return {self._task_type}
+
+    def map_to_subtasks(self, task):
+        return [self._task_type() for _ in range(self._count)]
+
+
+class TestCompositeLayers(TestCase):
+    def _run(self, composite, tasks=1):
+        drive = TimedCollectLayer({DriveTask})
+        belt = TimedCollectLayer({PeripheralTask})
+        lg = (LayerGraph()
+            .add_connection(EmitterLayer([WinTask() for _ in range(tasks)]), composite)
+            .add_connection(composite, drive)
+            .add_connection(composite, belt))
+        rc = RobotController()
+        rc.setup(None, None, lg, LoggerProvider())
+        for tick in range(100):
+            if rc.update():
+                return drive.ticks, belt.ticks, tick
+        self.fail('Controller did not finish')
+
+    def test_sequence(self):
+        drive, belt, _ = self._run(SequenceLayer([
+            StepsLayer(DriveTask, 2),
+            StepsLayer(PeripheralTask, 2),
+        ]), tasks=2)
+        self.assertEqual(len(drive), 4)
+        self.assertEqual(len(belt), 4)
+        self.assertLess(drive[1], belt[0])
+        self.assertLess(belt[1], drive[2])
+
+    def test_parallel_overlaps(self):
+        composite = ParallelLayer([StepsLayer(DriveTask, 3), StepsLayer(PeripheralTask, 3)])
+        drive, belt, parallel_ticks = self._run(composite, tasks=2)
+        self.assertEqual(drive, belt)
+        self.assertEqual(len(drive), 6)
+        _, _, sequence_ticks = self._run(SequenceLayer(
+            [StepsLayer(DriveTask, 3), StepsLayer(PeripheralTask, 3)]
+        ), tasks=2)
+        self.assertLess(parallel_ticks, sequence_ticks)
+
+    def test_parallel_any(self):
+        drive, belt, _ = self._run(ParallelLayer(
+            [StepsLayer(DriveTask, 1), StepsLayer(PeripheralTask, 3)],
+            wait_for_all=False
+        ), tasks=2)
+        self.assertEqual(len(drive), 2)
+        self.assertLess(len(belt), 6)
+
+    def test_task_types(self):
+        composite = ParallelLayer([StepsLayer(DriveTask, 1), StepsLayer(PeripheralTask, 1)])
+        self.assertEqual(composite.get_input_tasks(), {WinTask})
+        self.assertEqual(composite.get_output_tasks(), {DriveTask, PeripheralTask})
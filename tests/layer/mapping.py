@@ -0,0 +1,73 @@
+from controller import LayerGraph
+from controller import RobotController
+from layer import AbstractQueuedLayer
+from layer import LayerProcessContext
+from layer.mapping import ZeldaDriveMapping
+from log import LoggerProvider
+from task.drive import TankDriveTask
+from task.input import GamepadInputTask
+from tests.controller import CollectLayer
+from tests.controller import StickLayer
+from tests.controller import WinTask
+from unittest import TestCase
+
+
+class RepeatLayer(AbstractQueuedLayer):
+    """Plans the same equal-valued TankDriveTask over and over."""
+
+    def get_input_tasks(self):
+        return {WinTask}
+
+    def get_output_tasks(self):
+        return {TankDriveTask}
+
+    def map_to_subtasks(self, task):
+        while True:
+            yield TankDriveTask(1, 1)
+
+
+class TestMemoizedFunctionLayer(TestCase):
+    def _run(self, values):
+        # Each GamepadInputTask has the left stick pushed forward by one of values.
+        tasks = []
+        for value in values:
+            task = GamepadInputTask.create_idle()
+            task.set(0.0, value, False, False, 0.0, 0.0, False, False,
+                False, False, False, False, False, False, False, False)
+            tasks.append(task)
+        collector = CollectLayer({TankDriveTask})
+        lg = LayerGraph().add_chain([StickLayer(tasks), ZeldaDriveMapping(), collector])
+        rc = RobotController()
+        rc.setup(None, None, lg, LoggerProvider())
+        for _ in range(100):
+            if rc.update():
+                break
+        else:
+            self.fail('Controller did not finish')
+        return collector.collect()
+
+    def test_suppresses_equal_output(self):
+        tasks = self._run([0.0, 0.0, 0.0, 0.5, 0.5, 0.0])
+        self.assertEqual(tasks, [
+            TankDriveTask(0.0, 0.0),
+            TankDriveTask(0.5, 0.5),
+            TankDriveTask(0.0, 0.0),
+        ])
+
+    def test_emits_first(self):
+        self.assertEqual(self._run([0.0]), [TankDriveTask(0.0, 0.0)])
+
+
+class TestValueTaskCompletion(TestCase):
+    def test_late_equal_completion(self):
+        emitted = []
+        ctx = LayerProcessContext(emitted.append, lambda task: None, lambda: None)
+        layer = RepeatLayer()
+        layer.accept_task(WinTask())
+        layer.process(ctx)
+        layer.accept_task(WinTask())
+        layer.process(ctx)
+        # The first task's subtask completes after the second task's equal one was emitted.
+        layer.subtask_completed(emitted[0])
+        layer.process(ctx)
+        self.assertEqual(len(emitted), 2)
@@ -0,0 +1,125 @@
+from controller import LayerGraph
+from controller import RobotController
+from layer import Layer
+from layer.offload import AbstractOffloadedLayer
+from log import LoggerProvider
+from task import Task
+from unittest import TestCase
+import os
+import time
+
+
+class TestAbstractOffloadedLayer(TestCase):
+    def setUp(self):
+        self._square = SquareLayer()
+        self._sink = ResultSinkLayer()
+        lg = LayerGraph().add_chain([NumberSourceLayer(3), self._square, self._sink])
+        self._rc = RobotController()
+        self._rc.setup(None, None, lg, LoggerProvider())
+
+    def tearDown(self):
+        self._square.stop_worker()
+
+    def test_result_delivered_later(self):
+        self._rc.update()
+        # The worker can't have answered within the tick that sent it the snapshot.
+        self.assertEqual(self._sink.results, [])
+        deadline = time.monotonic() + 5
+        while not self._sink.results and time.monotonic() < deadline:
+            self._rc.update()
+        self.assertEqual(len(self._sink.results), 1)
+        square, pid = self._sink.results[0]
+        self.assertEqual(square, 9)
+        self.assertNotEqual(pid, os.getpid())
+
+    def test_finishes(self):
+        deadline = time.monotonic() + 5
+        while not self._rc.update():
+            self.assertLess(time.monotonic(), deadline)
+
+
+class NumberTask(Task):
+    def __init__(self, value):
+        self.value = value
+
+
+class ResultTask(Task):
+    def __init__(self, result):
+        self.result = result
+
+
+class NumberSourceLayer(Layer):
+    def __init__(self, value):
+        self._task = NumberTask(value)
+        self._emitted = False
+        self._completed = False
+
+    def get_input_tasks(self):
+        return set()
+
+    def get_output_tasks(self):
+        return {NumberTask}
+
+    def subtask_completed(self, task):
+        self._completed = True
+
+    def process(self, ctx):
+        if not self._emitted:
+            self._emitted = True
+            ctx.emit_subtask(self._task)
+        if self._completed:
+            ctx.request_task()
+
+    def accept_task(self, task):
+        raise TypeError
+
+
+class SquareLayer(AbstractOffloadedLayer):
+    def __init__(self):
+        self._task = None
+        self._snapshot = None
+
+    def get_input_tasks(self):
+        return {NumberTask}
+
+    def get_output_tasks(self):
+        return {ResultTask}
+
+    def accept_task(self, task):
+        self._task = task
+        self._snapshot = task.value
+
+    def get_snapshot(self):
+        snapshot = self._snapshot
+        self._snapshot = None
+        return snapshot
+
+    def compute(self, snapshot):
+        return snapshot * snapshot, os.getpid()
+
+    def process_result(self, result, ctx):
+        ctx.emit_subtask(ResultTask(result))
+        ctx.complete_task(self._task)
+        self._task = None
+
+    def process(self, ctx):
+        super().process(ctx)
+        if not self._task:
+            ctx.request_task()
+
+
+class ResultSinkLayer(Layer):
+    def __init__(self):
+        self.results = []
+
+    def get_input_tasks(self):
+        return {ResultTask}
+
+    def get_output_tasks(self):
+        return set()
+
+    def process(self, ctx):
+        ctx.request_task()
+
+    def accept_task(self, task):
+        self.results.append(task.result)
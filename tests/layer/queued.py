@@ -0,0 +1,82 @@
+from controller import LayerGraph
+from controller import RobotController
+from itertools import count
+from layer import AbstractQueuedLayer
+from layer import LayerProcessContext
+from log import LoggerProvider
+from tests.controller import DriveTask
+from tests.controller import EmitterLayer
+from tests.controller import TimedCollectLayer
+from tests.controller import WinTask
+from unittest import TestCase
+
+
+class StepTask(DriveTask):
+    def __init__(self, step):
+        self.step = step
+
+
+class PlanLayer(AbstractQueuedLayer):
+    """Plans length steps from a generator, recording how far the generator has been advanced."""
+
+    def __init__(self, length=None, lookahead=0):
+        super().__init__(lookahead)
+        self._length = length
+        self.generated = 0
+
+    def get_input_tasks(self):
+        return {WinTask}
+
+    def get_output_tasks(self):
+        return {StepTask}
+
+    def map_to_subtasks(self, task):
+        for step in (range(self._length) if self._length != None else count()):
+            self.generated += 1
+            yield StepTask(step)
+
+
+class TestAbstractQueuedLayer(TestCase):
+    def _setup(self, plan):
+        collector = TimedCollectLayer({DriveTask})
+        lg = LayerGraph().add_chain([EmitterLayer([WinTask()]), plan, collector])
+        rc = RobotController()
+        rc.setup(None, None, lg, LoggerProvider())
+        return rc, collector
+
+    def test_emits_every_tick(self):
+        rc, collector = self._setup(PlanLayer(4))
+        for _ in range(20):
+            if rc.update():
+                break
+        else:
+            self.fail('Controller did not finish')
+        self.assertEqual([t.step for t in collector.collect()], [0, 1, 2, 3])
+        first = collector.ticks[0]
+        self.assertEqual(collector.ticks, list(range(first, first + 4)))
+
+    def test_lookahead(self):
+        plan = PlanLayer(lookahead=3)
+        rc, collector = self._setup(plan)
+        for _ in range(10):
+            rc.update()
+        self.assertEqual(plan.generated, len(collector.collect()) + 3)
+
+    def test_lazy(self):
+        plan = PlanLayer()
+        rc, collector = self._setup(plan)
+        for _ in range(10):
+            rc.update()
+        self.assertEqual(plan.generated, len(collector.collect()))
+
+    def test_prefetches_off_completion_path(self):
+        emitted = []
+        ctx = LayerProcessContext(emitted.append, lambda task: None, lambda: None)
+        plan = PlanLayer(4, lookahead=1)
+        plan.accept_task(WinTask())
+        plan.process(ctx)
+        generated = plan.generated
+        plan.subtask_completed(emitted[0])
+        self.assertEqual(plan.generated, generated)
+        plan.process(ctx)
+        self.assertEqual([t.step for t in emitted], [0, 1])
@@ -0,0 +1,81 @@
+from rate import FixedRateRunner
+from rate import LoopStats
+from unittest import TestCase
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, duration):
+        self.now += duration
+
+    def step(self, duration):
+        return lambda: self.sleep(duration)
+
+
+class TestLoopStats(TestCase):
+    def test_record(self):
+        stats = LoopStats(0.01)
+        stats.record_tick()
+        stats.record_period(0.012)
+        stats.record_tick(True, 2)
+        self.assertEqual(stats.get_tick_count(), 2)
+        self.assertEqual(stats.get_overrun_count(), 1)
+        self.assertEqual(stats.get_dropped_count(), 2)
+        self.assertAlmostEqual(stats.get_max_jitter(), 0.002)
+
+
+class TestFixedRateRunner(TestCase):
+    def setUp(self):
+        self._clock = FakeClock()
+
+    def _create_runner(self, rate, policy):
+        return FixedRateRunner(rate, policy, clock=self._clock.clock, sleep=self._clock.sleep)
+
+    def test_paced(self):
+        runner = self._create_runner(100, FixedRateRunner.DROP)
+        runner.run(self._clock.step(0.002), 11)
+        stats = runner.get_stats()
+        self.assertEqual(stats.get_tick_count(), 11)
+        self.assertAlmostEqual(stats.get_mean_period(), 0.01)
+        self.assertAlmostEqual(stats.get_max_jitter(), 0)
+        self.assertEqual(stats.get_overrun_count(), 0)
+        self.assertAlmostEqual(self._clock.now, 0.102)
+
+    def test_drop(self):
+        runner = self._create_runner(100, FixedRateRunner.DROP)
+        runner.tick(self._clock.step(0.025))
+        runner.tick(self._clock.step(0))
+        stats = runner.get_stats()
+        self.assertEqual(stats.get_overrun_count(), 1)
+        self.assertEqual(stats.get_dropped_count(), 2)
+        # The second tick waits for the first deadline that had not passed yet.
+        self.assertAlmostEqual(self._clock.now, 0.03)
+
+    def test_catch_up(self):
+        runner = self._create_runner(100, FixedRateRunner.CATCH_UP)
+        runner.tick(self._clock.step(0.025))
+        runner.tick(self._clock.step(0))
+        runner.tick(self._clock.step(0))
+        runner.tick(self._clock.step(0))
+        stats = runner.get_stats()
+        self.assertEqual(stats.get_overrun_count(), 1)
+        self.assertEqual(stats.get_dropped_count(), 0)
+        # Two late ticks run immediately, then the runner is back on schedule.
+        self.assertAlmostEqual(self._clock.now, 0.03)
+
+    def test_unpaced(self):
+        runner = self._create_runner(None, FixedRateRunner.DROP)
+        runner.run(self._clock.step(0.001), 5)
+        self.assertAlmostEqual(runner.get_stats().get_mean_period(), 0.001)
+        self.assertAlmostEqual(self._clock.now, 0.005)
+
+    def test_bad_rate(self):
+        with self.assertRaises(ValueError):
+            FixedRateRunner(0)
+        with self.assertRaises(ValueError):
+            FixedRateRunner(10, 'sometimes')
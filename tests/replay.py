@@ -0,0 +1,84 @@
+from controller import LayerGraph
+from controller import RobotController
+from layer import AbstractFunctionLayer
+from log import LoggerProvider
+from replay import TaskLog
+from replay import TaskRecorder
+from task import Task
+from tests.controller import StickLayer
+from tests.controller import TimedCollectLayer
+from unittest import TestCase
+import os
+import tempfile
+
+
+class StickTask(Task):
+    def __init__(self, value):
+        self.value = value
+
+
+class NegateMapping(AbstractFunctionLayer):
+    def get_input_tasks(self):
+        return {StickTask}
+
+    def get_output_tasks(self):
+        return {StickTask}
+
+    def map(self, task):
+        return StickTask(-task.value)
+
+
+class TestTaskRecorder(TestCase):
+    def setUp(self):
+        self._paths = []
+        for _ in range(2):
+            fd, path = tempfile.mkstemp(suffix='.tlog')
+            os.close(fd)
+            self._paths.append(path)
+
+    def tearDown(self):
+        for path in self._paths:
+            os.remove(path)
+
+    def _run(self, source, path):
+        collector = TimedCollectLayer()
+        lg = LayerGraph().add_chain([source, NegateMapping(), collector])
+        rc = RobotController().record(TaskRecorder(path))
+        rc.setup(None, None, lg, LoggerProvider())
+        while not rc.update():
+            pass
+        return collector
+
+    def _stick(self):
+        return StickLayer([StickTask(value) for value in (2, 1, 0)], interval=2)
+
+    def test_records(self):
+        source = self._stick()
+        collector = self._run(source, self._paths[0])
+        log = TaskLog(self._paths[0])
+        self.assertEqual(log.get_labels(), ['TimedCollectLayer', 'NegateMapping', 'StickLayer'])
+        self.assertEqual([t.value for _, t in log.get_emitted('StickLayer')], [2, 1, 0])
+        self.assertEqual([t.value for _, t in log.get_emitted('NegateMapping')], [-2, -1, 0])
+        self.assertEqual([tick for tick, _ in log.get_emitted('NegateMapping')], collector.ticks)
+        completed = [t.value for _, label, kind, t in log.get_records()
+            if label == 'TimedCollectLayer' and kind == TaskRecorder.COMPLETE]
+        self.assertEqual(completed, [-2, -1, 0])
+        self.assertNotIn('process', vars(source))
+
+    def test_replay(self):
+        recorded = self._run(self._stick(), self._paths[0])
+        replay = TaskLog(self._paths[0]).create_replay_layer('StickLayer')
+        self.assertEqual(replay.get_output_tasks(), {StickTask})
+        replayed = self._run(replay, self._paths[1])
+        self.assertEqual([t.value for t in replayed.collect()], [-2, -1, 0])
+        self.assertEqual(replayed.ticks, recorded.ticks)
+        self.assertEqual(
+            [(tick, t.value) for tick, t in TaskLog(self._paths[1]).get_emitted('ReplayLayer')],
+            [(tick, t.value) for tick, t in TaskLog(self._paths[0]).get_emitted('StickLayer')]
+        )
+
+    def test_not_a_log(self):
+        with open(self._paths[0], 'wb') as file:
+            file.write(b'garbage')
+        with self.assertRaises(ValueError):
+            TaskLog(self._paths[0])
@@ -0,0 +1,63 @@
+from task import TaskPool
+from task.drive import TankDriveTask
+from task.drive import TurnTask
+from task.manipulator import DriveBeltTask
+from task.input import GamepadInputTask
+from task.input import KeyboardInputTask
+from unittest import TestCase
+import pickle
+
+
+class TestTaskPool(TestCase):
+    def test_ring(self):
+        pool = TaskPool(GamepadInputTask.create_idle, 2)
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertIs(pool.acquire(), first)
+
+    def test_size(self):
+        with self.assertRaises(ValueError):
+            TaskPool(GamepadInputTask.create_idle, 0)
+
+
+class TestInputTasks(TestCase):
+    def test_gamepad_set(self):
+        task = GamepadInputTask.create_idle()
+        task.set(0.5, -0.5, True, 0.8, 0.0, 0.25, False, 0.1,
+            True, False, False, True, False, True, False, False)
+        self.assertEqual((task.joysticks.left.x, task.joysticks.left.y), (0.5, -0.5))
+        self.assertEqual(task.joysticks.right.y, 0.25)
+        self.assertEqual((task.triggers.left, task.triggers.right), (True, False))
+        self.assertEqual((task.dpad.up, task.dpad.left), (True, True))
+        self.assertTrue(task.buttons.b)
+
+    def test_keyboard_get(self):
+        values = tuple(key == 'w' for key in KeyboardInputTask.KEYS)
+        task = KeyboardInputTask(values)
+        self.assertTrue(task.get('w'))
+        self.assertFalse(task.get('down_arrow'))
+
+    def test_compact(self):
+        self.assertFalse(hasattr(GamepadInputTask.create_idle(), '__dict__'))
+        self.assertFalse(hasattr(TankDriveTask(0, 0), '__dict__'))
+
+    def test_pickle(self):
+        task = pickle.loads(pickle.dumps(TankDriveTask(0.5, -0.5)))
+        self.assertEqual((task.get_left(), task.get_right()), (0.5, -0.5))
+
+
+class TestValueTask(TestCase):
+    def test_equal(self):
+        self.assertEqual(TankDriveTask(0.5, -0.5), TankDriveTask(0.5, -0.5))
+        self.assertNotEqual(TankDriveTask(0.5, -0.5), TankDriveTask(0.5, 0.5))
+        self.assertEqual(hash(TankDriveTask(1, 0)), hash(TankDriveTask(1, 0)))
+
+    def test_type(self):
+        self.assertNotEqual(TurnTask(1.0), DriveBeltTask(1.0))
+        self.assertNotEqual(TankDriveTask(0, 0), None)
+
+    def test_ignores_origin(self):
+        task = TankDriveTask(0, 0)
+        task.origin = object()
+        self.assertEqual(task, TankDriveTask(0, 0))
@@ -0,0 +1,131 @@
+from controller import LayerGraph
+from controller import RobotController
+from devices import MotorConf
+from layer import AbstractFunctionLayer
+from log import LoggerProvider
+from tests.controller import CollectLayer
+from tests.controller import DriveTask
+from tests.controller import EmitterLayer
+from tests.controller import MotorLayer
+from tests.controller import StickLayer
+from tests.controller import WinTask
+from tracing import LatencyTracer
+from tracing import TraceBuffer
+from tracing import TracingRobot
+from unittest import TestCase
+import json
+import os
+import tempfile
+
+
+class FakeRobot:
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, device_id, key):
+        return self.values.get((device_id, key), 0)
+
+    def set_value(self, device_id, key, value):
+        self.values[(device_id, key)] = value
+
+
+class TestTraceBuffer(TestCase):
+    def test_events(self):
+        buffer = TraceBuffer(8)
+        buffer.begin('test', 'outer')
+        buffer.begin('test', 'inner', 'arg')
+        buffer.end('test', 'inner', 'arg')
+        buffer.end('test', 'outer')
+        events = buffer.get_events()
+        self.assertEqual([e['ph'] for e in events], ['B', 'B', 'E', 'E'])
+        self.assertEqual(events[1]['name'], 'inner arg')
+        self.assertLessEqual(events[0]['ts'], events[-1]['ts'])
+
+    def test_wrap(self):
+        buffer = TraceBuffer(3)
+        buffer.begin('test', 'a')
+        buffer.end('test', 'a')
+        buffer.begin('test', 'b')
+        buffer.end('test', 'b')
+        self.assertEqual(len(buffer), 3)
+        # The end of span a has no begin left in the buffer, so it is dropped.
+        self.assertEqual([(e['name'], e['ph']) for e in buffer.get_events()],
+            [('b', 'B'), ('b', 'E')])
+
+    def test_export(self):
+        buffer = TraceBuffer()
+        robot = TracingRobot(FakeRobot(), buffer)
+        robot.set_value('motor', 'velocity_a', 0.5)
+        self.assertEqual(robot.get_value('motor', 'velocity_a'), 0.5)
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            buffer.export_chrome_trace(path)
+            with open(path) as file:
+                trace = json.load(file)
+        finally:
+            os.remove(path)
+        self.assertEqual([e['name'] for e in trace['traceEvents']],
+            ['set_value velocity_a'] * 2 + ['get_value velocity_a'] * 2)
+
+
+class TestControllerTrace(TestCase):
+    def test_layer_spans(self):
+        buffer = TraceBuffer()
+        collector = CollectLayer()
+        lg = LayerGraph().add_chain([EmitterLayer([WinTask()]), collector])
+        rc = RobotController().trace(buffer)
+        rc.setup(FakeRobot(), None, lg, LoggerProvider())
+        while not rc.update():
+            pass
+        names = [e['name'] for e in buffer.get_events() if e['ph'] == 'B']
+        self.assertEqual(names.count('update'), 2)
+        self.assertIn('CollectLayer accept_task', names)
+        self.assertIn('EmitterLayer subtask_completed', names)
+        self.assertNotIn('process', vars(collector))
+
+
+class DriveMapping(AbstractFunctionLayer):
+    def get_input_tasks(self):
+        return {WinTask}
+
+    def get_output_tasks(self):
+        return {DriveTask}
+
+    def map(self, task):
+        return DriveTask()
+
+
+class TestLatencyTracer(TestCase):
+    def _run(self, tracer, ticks):
+        conf = {
+            'left': MotorConf('kb', 'a', False, False, 1),
+            'right': MotorConf('kb', 'b', False, False, 1),
+        }
+        motor = MotorLayer(['left', 'right'])
+        lg = LayerGraph().add_chain([StickLayer([WinTask() for _ in range(ticks)]), DriveMapping(),
+            motor])
+        rc = RobotController().trace_latency(tracer)
+        rc.setup(FakeRobot(), conf, lg, LoggerProvider())
+        while not rc.update():
+            pass
+        return motor
+
+    def test_path_latency(self):
+        tracer = LatencyTracer()
+        motor = self._run(tracer, 3)
+        latency = tracer.get_path_latency(('StickLayer', 'DriveMapping', 'MotorLayer'))
+        self.assertEqual([str(l) for l in tracer.get_all_path_latencies()], [str(latency)])
+        # One sample per task, not per write.
+        self.assertEqual(latency.ticks.get_count(), 3)
+        # AbstractFunctionLayer emits on the update after it accepts a task.
+        self.assertEqual(latency.ticks.get_max(), 1)
+        self.assertGreater(latency.seconds.get_max(), 0)
+        self.assertNotIn('process', vars(motor))
+
+    def test_origin(self):
+        first, second = self._run(LatencyTracer(), 2).collect()
+        self.assertEqual(first.origin.path, ('StickLayer', 'DriveMapping'))
+        self.assertIsNotNone(first.origin.parent_id)
+        self.assertNotEqual(first.origin.parent_id, second.origin.parent_id)
+        self.assertLess(first.origin.tick, second.origin.tick)
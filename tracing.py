@@ -0,0 +1,335 @@
+from layer import ForwardingContext
+from profiling import RollingHistogram
+from profiling import ShadowedMethods
+from threading import get_ident
+from threading import local
+from time import perf_counter
+import json
+import os
+
+
+class TraceBuffer:
+    """Records begin/end events into a preallocated ring buffer and exports them in the Chrome
+    trace-event format, which chrome://tracing and Perfetto can open.
+
+    Once the buffer is full, the oldest events are overwritten.
+    """
+
+    BEGIN = 'B'
+    END = 'E'
+
+    def __init__(self, capacity=65536):
+        self._capacity = capacity
+        self._phases = [None] * capacity
+        self._names = [None] * capacity
+        self._categories = [None] * capacity
+        self._args = [None] * capacity
+        self._timestamps = [0.0] * capacity
+        self._threads = [0] * capacity
+        self._next = 0
+        self._count = 0
+
+    def begin(self, category, name, arg=None):
+        self._record(self.BEGIN, category, name, arg)
+
+    def end(self, category, name, arg=None):
+        self._record(self.END, category, name, arg)
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self._capacity)
+
+    def _record(self, phase, category, name, arg):
+        i = self._next
+        self._phases[i] = phase
+        self._categories[i] = category
+        self._names[i] = name
+        self._args[i] = arg
+        self._timestamps[i] = perf_counter()
+        self._threads[i] = get_ident()
+        i += 1
+        self._next = 0 if i == self._capacity else i
+        self._count += 1
+
+    def get_events(self):
+        """Returns the buffered events, oldest first, as Chrome trace-event dicts.
+
+        End events whose begin event has been overwritten are left out so every remaining span is
+        balanced.
+        """
+        filled = len(self)
+        start = self._next if self._count > self._capacity else 0
+        pid = os.getpid()
+        depths = {}
+        events = []
+        for offset in range(filled):
+            i = (start + offset) % self._capacity
+            tid = self._threads[i]
+            phase = self._phases[i]
+            if phase == self.BEGIN:
+                depths[tid] = depths.get(tid, 0) + 1
+            elif depths.get(tid, 0):
+                depths[tid] -= 1
+            else:
+                continue
+            name = self._names[i]
+            if self._args[i] != None:
+                name = f'{name} {self._args[i]}'
+            events.append({
+                'name': name,
+                'cat': self._categories[i],
+                'ph': phase,
+                'ts': self._timestamps[i] * 1e6,
+                'pid': pid,
+                'tid': tid,
+            })
+        return events
+
+    def export_chrome_trace(self, path):
+        """Writes the buffered events to path as a Chrome trace-event JSON file."""
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': self.get_events(), 'displayTimeUnit': 'ms'}, file)
+
+
+class TracingRobot:
+    """Wraps a Robot to record a span around every get_value and set_value call."""
+
+    def __init__(self, robot, buffer):
+        self._robot = robot
+        self._buffer = buffer
+
+    def get_value(self, device_id, key):
+        self._buffer.begin('device', 'get_value', key)
+        try:
+            return self._robot.get_value(device_id, key)
+        finally:
+            self._buffer.end('device', 'get_value', key)
+
+    def set_value(self, device_id, key, value):
+        self._buffer.begin('device', 'set_value', key)
+        try:
+            self._robot.set_value(device_id, key, value)
+        finally:
+            self._buffer.end('device', 'set_value', key)
+
+
+class LayerTracer:
+    """Records a span around every call a RobotController makes into its layers."""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._shadowed = ShadowedMethods()
+
+    def instrument(self, layers):
+        for layer in layers:
+            label = type(layer).__name__
+            for name in ('process', 'accept_task', 'subtask_completed'):
+                self._shadowed.shadow(layer, name, self._wrap(getattr(layer, name), name, label))
+
+    def restore(self):
+        """Removes the tracing wrappers."""
+        self._shadowed.restore()
+
+    def _wrap(self, method, name, label):
+        buffer = self._buffer
+
+        def traced_call(arg):
+            buffer.begin('layer', label, name)
+            try:
+                method(arg)
+            finally:
+                buffer.end('layer', label, name)
+        return traced_call
+
+
+class TaskOrigin:
+    """Causal trace information a LatencyTracer attaches to every task a layer emits, as the
+    task's origin attribute."""
+    __slots__ = 'id', 'parent_id', 'time', 'tick', 'path'
+
+    def __init__(self, id, parent_id, time, tick, path):
+        self.id = id
+        # The id of the task the emitting layer had most recently accepted, or None if the task
+        # was emitted by a source layer.
+        self.parent_id = parent_id
+        # The perf_counter time and tick at which the source layer that started the chain began
+        # processing.
+        self.time = time
+        self.tick = tick
+        # Type names of the layers the chain has passed through, starting with the source.
+        self.path = path
+
+
+class PathLatency:
+    """End-to-end latencies of the tasks that reached robot writes along one layer path."""
+
+    def __init__(self, path, window):
+        self._path = path
+        self.seconds = RollingHistogram(window)
+        self.ticks = RollingHistogram(window)
+
+    def get_path(self):
+        return self._path
+
+    def get_label(self):
+        return ' -> '.join(self._path)
+
+    def __str__(self):
+        if not self.ticks.get_count():
+            return f'{self.get_label()}: n=0'
+        return (f'{self.get_label()}: n={self.ticks.get_count()} '
+            f'p50={self.seconds.percentile(0.5) * 1e3:.2f}ms '
+            f'p99={self.seconds.percentile(0.99) * 1e3:.2f}ms '
+            f'max={self.seconds.get_max() * 1e3:.2f}ms '
+            f'ticks p50={self.ticks.percentile(0.5):.0f} max={self.ticks.get_max():.0f}')
+
+
+class LatencyTracer:
+    """Measures how long input takes to reach the robot's actuators through a layer graph.
+
+    Every task a layer emits is stamped with a TaskOrigin. A source layer's tasks originate at the
+    start of the process call that emitted them; any other layer's tasks inherit the origin of the
+    task it most recently accepted, extended by the layer's name. When a layer writes to the robot
+    while handling a task, the time and ticks since that task's origin are recorded once per task
+    under its path, such as GamepadInputGenerator -> ZeldaDriveMapping -> TwoWheelDrive.
+    """
+
+    def __init__(self, window=1024):
+        self._window = window
+        self._paths = {}
+        self._shadowed = ShadowedMethods()
+        self._labels = {}
+        # The origin of the task each layer most recently accepted, and the id of the last one it
+        # was recorded for.
+        self._causes = {}
+        self._recorded = {}
+        self._current = local()
+        self._next_id = 0
+        self._tick = 0
+
+    def instrument(self, layers):
+        for layer in layers:
+            label = type(layer).__name__
+            self._labels[layer] = label
+            self._causes[layer] = None
+            self._recorded[layer] = None
+            self._shadowed.shadow(layer, 'process',
+                self._wrap_process(layer, layer.process, label))
+            self._shadowed.shadow(layer, 'accept_task',
+                self._wrap_accept_task(layer, layer.accept_task))
+
+    def restore(self):
+        """Removes the stamping wrappers."""
+        self._shadowed.restore()
+
+    def wrap_robot(self, robot):
+        """Returns a Robot that records a latency sample when a layer writes to it."""
+        return _LatencyRobot(robot, self)
+
+    def next_tick(self):
+        """Advances the tick count origins are stamped with. RobotController calls this at the
+        start of every update."""
+        self._tick += 1
+
+    def get_path_latency(self, path):
+        """Returns the PathLatency for a tuple of layer type names, or None if nothing has been
+        recorded along it."""
+        return self._paths.get(tuple(path))
+
+    def get_all_path_latencies(self):
+        return list(self._paths.values())
+
+    def log_report(self, logger):
+        for latency in self._paths.values():
+            logger.info(str(latency))
+
+    def _stamp(self, layer, label, task, source_time):
+        origin = self._causes[layer]
+        self._next_id += 1
+        if origin != None:
+            task.origin = TaskOrigin(
+                self._next_id,
+                origin.id,
+                origin.time,
+                origin.tick,
+                (*origin.path, label)
+            )
+        else:
+            task.origin = TaskOrigin(self._next_id, None, source_time, self._tick, (label,))
+
+    def _actuated(self):
+        layer = getattr(self._current, 'layer', None)
+        if layer == None:
+            return
+        origin = self._causes[layer]
+        if origin == None or self._recorded[layer] == origin.id:
+            return
+        self._recorded[layer] = origin.id
+        path = (*origin.path, self._labels[layer])
+        latency = self._paths.get(path)
+        if latency == None:
+            latency = self._paths[path] = PathLatency(path, self._window)
+        latency.seconds.record(perf_counter() - origin.time)
+        latency.ticks.record(self._tick - origin.tick)
+
+    def _wrap_process(self, layer, process, label):
+        ctx = _StampingContext(self, layer, label)
+        current = self._current
+
+        def traced_process(inner_ctx):
+            ctx._inner = inner_ctx
+            ctx._start = perf_counter()
+            previous = getattr(current, 'layer', None)
+            current.layer = layer
+            try:
+                process(ctx)
+            finally:
+                current.layer = previous
+        return traced_process
+
+    def _wrap_accept_task(self, layer, accept_task):
+        causes = self._causes
+        current = self._current
+
+        def traced_accept_task(task):
+            causes[layer] = getattr(task, 'origin', None)
+            previous = getattr(current, 'layer', None)
+            current.layer = layer
+            try:
+                accept_task(task)
+            finally:
+                current.layer = previous
+        return traced_accept_task
+
+
+class _StampingContext(ForwardingContext):
+    """Stamps the tasks a layer emits with their origin."""
+
+    def __init__(self, tracer, layer, label):
+        super().__init__()
+        self._tracer = tracer
+        self._layer = layer
+        self._label = label
+        self._start = None
+
+    def emit_subtask(self, subtask):
+        self._tracer._stamp(self._layer, self._label, subtask, self._start)
+        self._inner.emit_subtask(subtask)
+
+
+class _LatencyRobot:
+    """Wraps a Robot to tell a LatencyTracer about every set_value call."""
+
+    def __init__(self, robot, tracer):
+        self._robot = robot
+        self._tracer = tracer
+
+    def get_value(self, device_id, key):
+        return self._robot.get_value(device_id, key)
+
+    def set_value(self, device_id, key, value):
+        self._tracer._actuated()
+        self._robot.set_value(device_id, key, value)